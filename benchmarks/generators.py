@@ -0,0 +1,133 @@
+"""Generators of synthetic documents, schemas and handlers."""
+
+import os
+import sys
+import tomllib
+from typing import Any, Callable, Dict, NamedTuple
+
+_examples = os.path.join(os.path.dirname(__file__), "..", "examples")
+
+
+class Case(NamedTuple):
+    """A benchmark case."""
+
+    schema: dict
+    handlers: dict
+    data: dict
+
+
+def wide(scale: float = 1.0) -> Case:
+    """A flat table with many keys of mixed types."""
+    n = max(1, int(50_000 * scale))
+    types = (str, int, float, bool)
+    values = ("value", 1, 1.5, True)
+
+    schema = {f"key_{i}": types[i % 4] for i in range(n)}
+    data = {f"key_{i}": values[i % 4] for i in range(n)}
+
+    return Case(schema, {}, data)
+
+
+def deep(scale: float = 1.0) -> Case:
+    """Deeply nested tables, each with a few values."""
+    depth = max(1, int(200 * scale))
+
+    schema: Dict[str, Any] = {"leaf": int}
+    data: Dict[str, Any] = {"leaf": 1}
+    for i in reversed(range(depth)):
+        schema = {f"level_{i}": schema, "name": str, "count?": int}
+        data = {f"level_{i}": data, "name": "table", "count": i}
+
+    return Case(schema, {}, data)
+
+
+def scalar_array(scale: float = 1.0) -> Case:
+    """A single array with many scalar elements."""
+    n = max(1, int(1_000_000 * scale))
+    return Case({"values": [int]}, {}, {"values": list(range(n))})
+
+
+def array_of_tables(scale: float = 1.0) -> Case:
+    """An array with many tables of the same shape."""
+    n = max(1, int(20_000 * scale))
+
+    schema = {
+        "servers": [
+            {
+                "name": str,
+                "port": int,
+                "enabled": bool,
+                "region": lambda value: None if value else "empty",
+            }
+        ]
+    }
+    data = {
+        "servers": [
+            {
+                "name": f"server-{i}",
+                "port": 8000 + i % 100,
+                "enabled": i % 2 == 0,
+                "region": ("eu", "us", "ap")[i % 3],
+            }
+            for i in range(n)
+        ]
+    }
+
+    return Case(schema, {}, data)
+
+
+def wildcards(scale: float = 1.0) -> Case:
+    """Hundreds of wildcard handlers matched against many keys."""
+    rules = max(1, int(500 * scale))
+    tables = max(1, int(200 * scale))
+
+    handlers = {f"table_{i}.*_{i}": int for i in range(rules)}
+    handlers.update({f"*.suffix_{i}": str for i in range(rules)})
+    handlers["*"] = lambda: None
+
+    data = {
+        f"table_{i}": {
+            f"key_{i % rules}": 1,
+            f"suffix_{i % rules}": "value",
+            "other": 1.5,
+        }
+        for i in range(tables)
+    }
+
+    schema = {f"table_{i}?": {"other": float} for i in range(5)}
+
+    return Case(schema, handlers, data)
+
+
+def full_spec(scale: float = 1.0) -> Case:
+    """The full specification example, repeated in many tables."""
+    copies = max(1, int(100 * scale))
+
+    sys.path.insert(0, os.path.join(_examples, "full_spec"))
+    try:
+        from schema_specific import (  # pylint: disable=C0415
+            full_spec_schema,
+        )
+    finally:
+        sys.path.pop(0)
+
+    with open(os.path.join(_examples, "full_spec", "schema.toml"), "rb") as f:
+        document = tomllib.load(f)
+
+    schema = full_spec_schema.to_dict()
+
+    return Case(
+        {f"copy_{i}": schema for i in range(copies)},
+        {},
+        {f"copy_{i}": document for i in range(copies)},
+    )
+
+
+CASES: Dict[str, Callable[[float], Case]] = {
+    "wide": wide,
+    "deep": deep,
+    "scalar_array": scalar_array,
+    "array_of_tables": array_of_tables,
+    "wildcards": wildcards,
+    "full_spec": full_spec,
+}
@@ -0,0 +1,196 @@
+"""Run the benchmarks and record the results as JSON."""
+
+import argparse
+import gc
+import json
+import platform
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from importlib import metadata
+from typing import Any, Callable, Dict, List
+
+from benchmarks.generators import CASES, Case
+from tomlval import TOMLSchema, TOMLValidator
+from tomlval.utils import flatten
+
+
+def _version() -> str:
+    """Get the installed version of the package."""
+    try:
+        return metadata.version("tomlval")
+    except metadata.PackageNotFoundError:
+        return "unknown"
+
+
+def measure(fn: Callable[[], Any], repeat: int, items: int) -> dict:
+    """
+    Measure the run time and peak memory of a function.
+
+    The function is timed without tracing memory, then run once more
+    while tracing to find the peak memory it allocates.
+
+    Args:
+        fn: Callable[[], Any] - The function to measure.
+        repeat: int - The number of timed runs.
+        items: int - The number of items processed by each run.
+    Returns:
+        dict - The best and mean time in seconds, the throughput in
+        items per second and the peak memory in bytes.
+    Raises:
+        None
+    """
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    best = min(times)
+    return {
+        "best": best,
+        "mean": sum(times) / len(times),
+        "throughput": items / best if best > 0 else None,
+        "peak_memory": peak,
+    }
+
+
+def run_case(case: Case, repeat: int) -> dict:
+    """
+    Benchmark every stage of validating a case.
+
+    Args:
+        case: Case - The schema, handlers and data to validate.
+        repeat: int - The number of timed runs of each stage.
+    Returns:
+        dict - The number of keys and the results of each stage.
+    Raises:
+        None
+    """
+    schema = TOMLSchema(case.schema)
+    validator = TOMLValidator(schema, dict(case.handlers))
+    flat = flatten(case.data)
+    validator.compile()
+
+    stages: Dict[str, Callable[[], Any]] = {
+        "schema": lambda: TOMLSchema(case.schema),
+        "compile": lambda: TOMLValidator(schema, dict(case.handlers)).compile(),
+        "flatten": lambda: flatten(case.data),
+        "map_handlers": lambda: validator._map_handlers(flat),
+        "compare_keys": lambda: schema.compare_keys(flat),
+        "validate": lambda: validator.validate(case.data),
+    }
+
+    items = {
+        "schema": len(schema.to_dict()),
+        "compile": len(validator.compile().handlers),
+    }
+
+    return {
+        "keys": len(flat),
+        "stages": {
+            name: measure(fn, repeat, items.get(name, len(flat)))
+            for name, fn in stages.items()
+        },
+    }
+
+
+def compare(results: dict, baseline: dict) -> List[str]:
+    """
+    Compare the results of two runs.
+
+    Args:
+        results: dict - The results of the current run.
+        baseline: dict - The results of a previous run.
+    Returns:
+        List[str] - A line with the speedup of each stage.
+    Raises:
+        None
+    """
+    lines = []
+    for name, case in results["cases"].items():
+        if (old := baseline.get("cases", {}).get(name)) is None:
+            continue
+        for stage, result in case["stages"].items():
+            if (old_stage := old["stages"].get(stage)) is None:
+                continue
+            speedup = old_stage["best"] / result["best"]
+            lines.append(f"{name:<16} {stage:<13} {speedup:>7.2f}x")
+    return lines
+
+
+def main(argv: List[str] | None = None) -> dict:
+    """
+    Run the benchmarks from the command line.
+
+    Args:
+        argv?: List[str] | None - The command line arguments.
+    Returns:
+        dict - The results of the run.
+    Raises:
+        None
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "cases",
+        nargs="*",
+        choices=[[], *CASES],
+        help="The cases to run, defaults to every case.",
+    )
+    parser.add_argument(
+        "--scale",
+        type=float,
+        default=1.0,
+        help="The size of the generated documents, relative to the default.",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=3,
+        help="The number of timed runs of each stage.",
+    )
+    parser.add_argument(
+        "--output", help="The file to write the results to as JSON."
+    )
+    parser.add_argument(
+        "--compare", help="A previous results file to compare against."
+    )
+    args = parser.parse_args(argv)
+
+    results: Dict[str, Any] = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "tomlval": _version(),
+        "scale": args.scale,
+        "repeat": args.repeat,
+        "cases": {},
+    }
+
+    for name in args.cases or CASES:
+        case = run_case(CASES[name](args.scale), args.repeat)
+        results["cases"][name] = case
+        for stage, result in case["stages"].items():
+            print(
+                f"{name:<16} {stage:<13} {result['best'] * 1000:>10.2f} ms"
+                f" {result['peak_memory'] / 2**20:>9.2f} MiB"
+            )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            print("\n".join(compare(results, json.load(f))))
+
+    return results
@@ -0,0 +1,50 @@
+""" Tests for the 'tomlval.toml_schema_cache' module. """
+
+import re
+
+from tomlval import TOMLSchema, TOMLSchemaCache
+
+
+def is_positive(value):
+    """A handler that can be referenced by its import path."""
+    return value <= 0
+
+
+SCHEMA = {
+    "name": str,
+    "code": re.compile(r"[a-z]+"),
+    "table": {"count": is_positive, "tags?": [str]},
+}
+
+
+def test_load(tmp_path):
+    """A compiled schema should be stored and loaded by a new cache."""
+    schema = TOMLSchemaCache(tmp_path).load(SCHEMA)
+    assert schema == TOMLSchema(SCHEMA)
+    assert len(list(tmp_path.glob("*.schema"))) == 1
+
+    loaded = TOMLSchemaCache(tmp_path).load(SCHEMA)
+    assert loaded is not schema
+    assert loaded == schema
+    assert loaded["table.count"] is is_positive
+
+
+def test_load_unpicklable(tmp_path):
+    """Schemas with lambdas should be compiled without being stored."""
+    schema = TOMLSchemaCache(tmp_path).load({"name": lambda value: None})
+    assert "name" in schema
+    assert not list(tmp_path.glob("*.schema"))
+
+
+def test_load_invalid_file(tmp_path):
+    """Unreadable files should be replaced by a compiled schema."""
+    cache = TOMLSchemaCache(tmp_path)
+    cache.load(SCHEMA)
+    (path,) = tmp_path.glob("*.schema")
+    path.write_bytes(b"invalid")
+
+    assert cache.load(SCHEMA) == TOMLSchema(SCHEMA)
+    assert path.read_bytes() != b"invalid"
+
+    cache.clear()
+    assert not list(tmp_path.glob("*.schema"))
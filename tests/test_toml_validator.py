@@ -0,0 +1,667 @@
+""" Tests for the 'tomlval.toml_validator' module. """
+
+import asyncio
+import gc
+import linecache
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from tomlval import (
+    TOMLFileCache,
+    TOMLSchema,
+    TOMLValidator,
+    batch,
+    expensive,
+    pure,
+)
+from tomlval.errors import TOMLHandlerError, TOMLSchemaError
+from tomlval.utils import flatten
+
+
+def test_compile_is_cached():
+    """The plan should be reused between validations."""
+    validator = TOMLValidator(TOMLSchema({"name": str}))
+    plan = validator.compile()
+    validator.validate({"name": "Alice"})
+    assert validator.compile() is plan
+
+
+def test_add_handler_invalidates_plan():
+    """Adding a handler should compile a new plan."""
+    validator = TOMLValidator(TOMLSchema({"name": str}))
+    plan = validator.compile()
+    validator.add_handler("age", int)
+    assert validator.compile() is not plan
+    assert validator.validate({"name": "Alice", "age": "30"}) == {
+        "age": "incorrect-type"
+    }
+
+
+def _documents(count):
+    """Generate documents where every third one is invalid."""
+    return ({"name": "x" if i % 3 else 1, "idx": i} for i in range(count))
+
+
+def test_validate_many_in_order():
+    """Batch validation should match validating one document at a time."""
+    validator = TOMLValidator(
+        TOMLSchema({"name": str, "idx": lambda value: value < 0})
+    )
+    expected = [validator.validate(d) for d in _documents(50)]
+
+    assert list(validator.validate_many(_documents(50))) == expected
+    for executor in ("thread", "process"):
+        results = validator.validate_many(
+            _documents(50), workers=2, executor=executor, chunksize=4
+        )
+        assert list(results) == expected
+
+
+def test_validate_many_unordered():
+    """Unordered batch validation should yield the index of each result."""
+    validator = TOMLValidator(TOMLSchema({"name": str}))
+    results = dict(
+        validator.validate_many(_documents(20), workers=2, ordered=False)
+    )
+    assert sorted(results) == list(range(20))
+    assert results[0] == {"name": "incorrect-type"}
+    assert results[1] == {}
+
+
+def test_validate_many_invalid_executor():
+    """An invalid executor should be rejected, even with a single worker."""
+    validator = TOMLValidator(TOMLSchema({"name": str}))
+    for workers in (1, 2):
+        with pytest.raises(ValueError):
+            validator.validate_many(_documents(2), workers, "invalid")
+        with pytest.raises(ValueError):
+            validator.validate_files([], workers, "invalid")
+
+
+def test_iter_errors_is_lazy():
+    """Errors should be produced one at a time."""
+    calls = []
+    validator = TOMLValidator(
+        TOMLSchema({"*": lambda key: calls.append(key) or "invalid"})
+    )
+    data = {f"key_{i}": i for i in range(10)}
+
+    errors = validator.iter_errors(data)
+    assert next(errors) == ("key_0", "invalid")
+    assert calls == ["key_0"]
+
+
+def test_fail_fast():
+    """Validation should stop after the error limit."""
+    validator = TOMLValidator(TOMLSchema({"*": int}))
+    data = {"a": "1", "b": "2", "c": 3}
+
+    assert len(validator.validate(data)) == 2
+    assert validator.validate(data, max_errors=1) == {"a": "incorrect-type"}
+    assert not validator.is_valid(data)
+    assert validator.is_valid({"c": 3})
+
+
+def test_nested_keys():
+    """Keys in nested tables and arrays of tables should be flattened."""
+    validator = TOMLValidator(
+        TOMLSchema({"table": {"key": int}}),
+        {"*": lambda key: f"unknown '{key}'"},
+    )
+    data = {"table": {"key": "1"}, "arr": [{"name": "a"}, {"other": 1}]}
+
+    assert validator.validate(data) == {
+        "table.key": "incorrect-type",
+        "arr.[0].name": "unknown 'arr.[0].name'",
+        "arr.[1].other": "unknown 'arr.[1].other'",
+    }
+
+
+def test_missing_keys():
+    """Required, optional and wildcard keys should be checked."""
+    validator = TOMLValidator(
+        TOMLSchema(
+            {
+                "name": str,
+                "arr": [{"name": str}],
+                "table": {"*": int},
+                "opt?": {"*": int},
+            }
+        )
+    )
+
+    assert validator.validate({}) == {
+        "name": "missing",
+        "arr[].name": "missing",
+        "table.*": "missing",
+    }
+    assert validator.is_valid(
+        {"name": "a", "arr": [{"name": "b"}], "table": {"key": 1}}
+    )
+
+
+def test_missing_keys_in_arrays():
+    """Each table in an array of tables should have the required keys."""
+    validator = TOMLValidator(
+        TOMLSchema(
+            {
+                "servers": [{"host": str, "port?": int, "tags": [{"id": int}]}],
+                "table": {"arr": [{"name": str}]},
+            }
+        )
+    )
+    data = {
+        "servers": [
+            {"host": "a", "tags": [{"id": 1}, {"other": 2}]},
+            {"port": 80, "tags": []},
+        ],
+        "table": {"arr": []},
+    }
+
+    assert validator.validate(data) == {
+        "servers.[0].tags.[1].id": "missing",
+        "servers.[1].host": "missing",
+        "servers.[1].tags[].id": "missing",
+        "table.arr[].name": "missing",
+    }
+
+    # Sessions should check the changed tables
+    session = validator.session(data)
+    assert session.set("servers.[1].host", "b") == {
+        "servers.[0].tags.[1].id": "missing",
+        "servers.[1].tags[].id": "missing",
+        "table.arr[].name": "missing",
+    }
+    assert session.update(
+        {"servers": [{"host": "a", "tags": [{"id": 1}]}], "table": {}}
+    ) == {"table.arr[].name": "missing"}
+
+
+def test_large_arrays_of_tables():
+    """Large arrays of tables should report errors in document order."""
+    validator = TOMLValidator(
+        TOMLSchema(
+            {
+                "servers": [
+                    {
+                        "host": str,
+                        "port": lambda key, value: value < 0 and key,
+                        "meta": {"zone": str},
+                    }
+                ]
+            }
+        )
+    )
+    servers = [
+        {"host": f"s{i}", "port": i, "meta": {"zone": "eu"}} for i in range(50)
+    ]
+    servers[3] = {"port": -1, "host": 3, "meta": {"zone": 1}}
+    servers[7]["meta"] = {"zone": None, "tags": [{"x": 1}]}
+    servers.insert(5, "other")
+
+    assert list(validator.iter_errors({"servers": servers})) == [
+        ("servers.[3].port", "servers.[3].port"),
+        ("servers.[3].host", "incorrect-type"),
+        ("servers.[3].meta.zone", "incorrect-type"),
+        ("servers.[8].meta.zone", "incorrect-type"),
+    ]
+
+
+def test_large_arrays_of_tables_stop_early():
+    """Stopping at the first error should not check every table."""
+    calls = []
+
+    def port(value):
+        calls.append(value)
+        return value < 0 and "negative"
+
+    validator = TOMLValidator(TOMLSchema({"servers": [{"port": port}]}))
+    servers = [{"port": i} for i in range(1000)]
+    servers[0]["port"] = -1
+
+    assert not validator.is_valid({"servers": servers})
+    assert len(calls) <= 32
+    assert validator.validate({"servers": servers}, max_errors=1) == {
+        "servers.[0].port": "negative"
+    }
+    assert len(calls) <= 64
+
+
+def test_lazy_schema():
+    """Lazy schemas should be validated on first use."""
+    schema = TOMLSchema({"name": str, "Invalid Key": int}, lazy=True)
+    assert repr(schema) == "<TOMLSchema lazy>"
+
+    for _ in range(2):
+        with pytest.raises(TOMLSchemaError):
+            schema.validate_schema()
+    with pytest.raises(TOMLSchemaError):
+        TOMLValidator(schema).validate({})
+
+    schema = TOMLSchema({"name": str}, lazy=True)
+    validator = TOMLValidator(schema)
+    assert repr(schema) == "<TOMLSchema lazy>"
+    assert validator.validate({}) == {"name": "missing"}
+    assert repr(schema) == "<TOMLSchema keys=1>"
+
+
+def test_validate_files_with_cache(tmp_path):
+    """Unchanged files should be served from the cache."""
+    calls = []
+    validator = TOMLValidator(
+        TOMLSchema({"name": lambda value: calls.append(value) or None})
+    )
+    paths = []
+    for i in range(3):
+        path = tmp_path / f"{i}.toml"
+        path.write_text(f'name = "{i}"\n')
+        paths.append(path)
+
+    cache = TOMLFileCache(tmp_path / "cache.pickle")
+    results = list(validator.validate_files(paths, cache=cache))
+    assert [path for path, _ in results] == paths
+    assert calls == ["0", "1", "2"]
+
+    # Unchanged files
+    cache = TOMLFileCache(tmp_path / "cache.pickle")
+    assert len(cache) == 3
+    list(validator.validate_files(paths, cache=cache))
+    assert calls == ["0", "1", "2"]
+
+    # Changed file
+    paths[1].write_text('name = "changed"\n')
+    assert validator.validate_file(paths[1], cache=cache) == {}
+    assert calls == ["0", "1", "2", "changed"]
+
+    # Saved by a single file, and by stopping early
+    cache = TOMLFileCache(tmp_path / "cache.pickle")
+    assert validator.validate_file(paths[1], cache=cache) == {}
+    paths[2].write_text('name = "early"\n')
+    next(validator.validate_files(paths[2:], cache=cache))
+    cache = TOMLFileCache(tmp_path / "cache.pickle")
+    list(validator.validate_files(paths, cache=cache))
+    assert calls == ["0", "1", "2", "changed", "early"]
+
+
+def test_validate_files_in_parallel(tmp_path):
+    """Files should be parsed and validated by a pool of workers."""
+    validator = TOMLValidator(TOMLSchema({"age": int}))
+    paths = []
+    for i in range(10):
+        path = tmp_path / f"{i}.toml"
+        path.write_text(f"age = {i}\n" if i % 2 else f'age = "{i}"\n')
+        paths.append(path)
+
+    results = dict(validator.validate_files(paths, workers=2))
+    assert results == {
+        path: {} if i % 2 else {"age": "incorrect-type"}
+        for i, path in enumerate(paths)
+    }
+
+
+def test_session():
+    """A session should only re-run the handlers of changed values."""
+    calls = []
+    validator = TOMLValidator(
+        TOMLSchema(
+            {
+                "name": lambda value: calls.append(value) or None,
+                "port": int,
+            }
+        ),
+        {"*.host": str},
+    )
+    data = {"name": "a", "port": 1, "servers": [{"host": "x"}]}
+    session = validator.session(data)
+    assert session.errors == {}
+    assert calls == ["a"]
+
+    # Changed value
+    assert session.set("port", "1") == {"port": "incorrect-type"}
+    assert session.update({"port": 2}) == {}
+    assert session.set("servers.[0].host", 1) == {
+        "servers.[0].host": "incorrect-type"
+    }
+    assert calls == ["a"]
+
+    # Missing keys
+    assert session.remove("name") == {
+        "servers.[0].host": "incorrect-type",
+        "name": "missing",
+    }
+    assert session.remove(("servers", 0)) == {"name": "missing"}
+    assert session.update({"name": "b", "servers": [{"host": "y"}]}) == {}
+    assert calls == ["a", "b"]
+    assert session.data is data
+    assert data == {"port": 2, "servers": [{"host": "y"}], "name": "b"}
+
+    # Invalid keys
+    with pytest.raises(KeyError):
+        session.remove("other")
+    with pytest.raises(KeyError):
+        session.set("servers.[5].host", "z")
+
+
+def test_session_matches_validate():
+    """A session should have the same errors as a full validation."""
+    validator = TOMLValidator(
+        TOMLSchema({"table": {"key": int}, "arr": [int], "opt?": str}),
+        {"table.*": lambda value: "five" if value == 5 else None},
+    )
+    data = {"table": {"key": 1, "other": 5}, "arr": [1, 2]}
+    session = validator.session(data)
+    changes = [
+        ("arr.[1]", "2"),
+        ("table.other", 4),
+        ("table", {"key": 5}),
+        ("opt", 1),
+    ]
+    for key, value in changes:
+        assert session.set(key, value) == validator.validate(data)
+
+    for key in ["arr.[0]", "arr", "table.key", "opt"]:
+        assert session.remove(key) == validator.validate(data)
+
+
+def test_avalidate():
+    """Async handlers should run concurrently within the limit."""
+    running = []
+    peak = []
+
+    async def lookup(value):
+        running.append(value)
+        peak.append(len(running))
+        await asyncio.sleep(0.01)
+        running.remove(value)
+        return "unknown" if value < 0 else None
+
+    validator = TOMLValidator(
+        TOMLSchema({"a": int, "t": {"x": (int, lookup)}}), {"n*": lookup}
+    )
+    data = {"a": "1", **{f"n{i}": i - 2 for i in range(6)}, "t": {"x": -1}}
+
+    assert asyncio.run(validator.avalidate(data, concurrency=2)) == {
+        "a": "incorrect-type",
+        "n0": "unknown",
+        "n1": "unknown",
+        "t.x": "unknown",
+    }
+    assert max(peak) == 2
+
+    with pytest.raises(TOMLHandlerError):
+        validator.validate(data)
+    with pytest.raises(ValueError):
+        asyncio.run(validator.avalidate(data, concurrency=0))
+
+
+def test_parallel_handlers():
+    """Expensive handlers should run in the executor, in document order."""
+    threads = {}
+
+    @expensive
+    def checksum(key, value):
+        threads[key] = threading.get_ident()
+        time.sleep(0.01 * (value % 3))
+        return "odd" if value % 2 else None
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        validator = TOMLValidator(
+            TOMLSchema({"a": int, "t": {"x": (int, checksum)}}),
+            {"n*": checksum},
+            parallel_handlers=pool,
+        )
+        data = {"a": "1", **{f"n{i}": i for i in range(8)}, "t": {"x": 1}}
+
+        errors = validator.validate(data)
+        assert list(errors.items()) == [
+            ("a", "incorrect-type"),
+            ("n1", "odd"),
+            ("n3", "odd"),
+            ("n5", "odd"),
+            ("n7", "odd"),
+            ("t.x", "odd"),
+        ]
+        assert threading.get_ident() not in threads.values()
+        assert validator.validate(data, max_errors=2) == {
+            "a": "incorrect-type",
+            "n1": "odd",
+        }
+        assert list(validator.validate_many([data], workers=2)) == [errors]
+        assert asyncio.run(validator.avalidate(data)) == errors
+
+
+def test_batch_handlers():
+    """Batch handlers should check every matching value at once."""
+    calls = []
+
+    def unique(values):
+        calls.append(list(values))
+        seen = set()
+        errors = {}
+        for idx, value in enumerate(values):
+            if value in seen:
+                errors[idx] = "duplicate"
+            seen.add(value)
+        return errors
+
+    @batch
+    def primary(roles):
+        return [] if roles[0] == "primary" else {0: "not-primary"}
+
+    validator = TOMLValidator(
+        TOMLSchema({"name": str, "hosts": [{"name": str}]}),
+        {"*.port": unique, "*.role": primary},
+    )
+    hosts = [{"name": f"h{i}", "port": i % 20} for i in range(24)]
+    hosts[0]["role"] = "primary"
+    data = {"name": 1, "hosts": hosts}
+
+    assert validator.validate(data) == {
+        "name": "incorrect-type",
+        **{f"hosts.[{i}].port": "duplicate" for i in range(20, 24)},
+    }
+    assert calls == [[i % 20 for i in range(24)]]
+
+    hosts[0]["role"] = "replica"
+    assert validator.validate(data)["hosts.[0].role"] == "not-primary"
+
+    # Values are passed in document order, also for large arrays
+    tables = [{"port": i, "meta": {"port": i}} for i in range(20)]
+    errors = validator.validate({"hosts": tables})
+    assert [k for k, v in errors.items() if v == "duplicate"] == [
+        f"hosts.[{i}].meta.port" for i in range(20)
+    ]
+    assert calls[-1] == [i for i in range(20) for _ in range(2)]
+
+    # Sessions run a batch with every value it matches
+    session = validator.session(data)
+    assert session.set("hosts.[1].port", 0) == validator.validate(data)
+    assert session.errors["hosts.[1].port"] == "duplicate"
+    assert session.set("hosts.[20].port", 100) == validator.validate(data)
+    assert "hosts.[20].port" not in session.errors
+
+    invalid = TOMLValidator(handlers={"port": lambda values: {1: "bad"}})
+    with pytest.raises(TOMLHandlerError):
+        invalid.validate({"port": 1})
+
+
+def test_memoize_pure_handlers():
+    """Pure handlers should only run once per distinct value."""
+    calls = []
+
+    @pure
+    def region(value):
+        calls.append(value)
+        return None if value in ("eu", "us") else "unknown-region"
+
+    validator = TOMLValidator(handlers={"*.region": region}, memo_size=16)
+    regions = ["eu", "us", "eu", "ap", "eu", "ap", True]
+    data = {"hosts": [{"region": r} for r in regions]}
+
+    assert validator.validate(data) == {
+        "hosts.[3].region": "unknown-region",
+        "hosts.[5].region": "unknown-region",
+        "hosts.[6].region": "unknown-region",
+    }
+    assert calls == ["eu", "us", "ap", True]
+    assert (validator.memo.hits, validator.memo.misses) == (3, 4)
+
+
+def test_memoize_all_handlers():
+    """With memoize, every function and pattern should be cached."""
+    calls = []
+    validator = TOMLValidator(
+        TOMLSchema({"tag": re.compile(r"v\d+")}),
+        {"name": lambda key, value: calls.append(key) or None},
+        memoize=True,
+    )
+    for _ in range(3):
+        assert validator.validate({"tag": "v1", "name": "a"}) == {}
+    assert validator.validate({"tag": "x"}) == {"tag": "pattern-mismatch"}
+
+    assert calls == ["name"]
+    assert validator.memo.hits == 4
+
+
+def test_memoize_subtrees():
+    """Identical tables should reuse their errors, re-keyed to their path."""
+    calls = []
+    validator = TOMLValidator(
+        TOMLSchema({"logging": {"level": str}}),
+        {"*.host": lambda value: calls.append(value) or None},
+        on_type_mismatch=lambda key, expected, got: f"{key} is {got.__name__}",
+        memoize_subtrees=True,
+    )
+    block = {"host": "a", "port": 1}
+    data = {"upstreams": [block, dict(block)], "logging": {"level": 1}}
+
+    errors = {"logging.level": "logging.level is int"}
+    assert validator.validate(data) == errors
+    assert validator.validate({**data, "other": 1}) == errors
+    assert calls == ["a"]
+
+    # Key dependent handlers are not memoized
+    validator.add_handler("*.port", lambda key: key)
+    assert validator.validate(data) == {
+        "upstreams.[0].port": "upstreams.[0].port",
+        "upstreams.[1].port": "upstreams.[1].port",
+        **errors,
+    }
+
+
+def test_profile():
+    """The profiler should record each handler pattern and phase."""
+    validator = TOMLValidator(
+        TOMLSchema({"name": str, "tags": [str]}),
+        {"*": lambda value: None},
+        profile=True,
+    )
+    for _ in range(3):
+        validator.validate({"name": 1, "tags": ["a"], "other": 1})
+
+    stats = validator.stats()
+    assert set(stats["phases"]) == {"mapping", "walk", "missing"}
+    assert stats["phases"]["walk"]["count"] == 3
+    assert stats["handlers"]["name"]["count"] == 3
+    assert stats["handlers"]["name"]["errors"] == 3
+    assert stats["handlers"]["*"]["errors"] == 0
+    assert stats["handlers"]["tags"]["max"] >= stats["handlers"]["tags"]["mean"]
+
+    report = validator.profiler.report()
+    assert report.startswith("[mapping] count=3")
+    assert "name = count=3" in report
+
+    validator.profiler.reset()
+    assert validator.stats() == {"handlers": {}, "phases": {}}
+
+    with pytest.raises(ValueError):
+        TOMLValidator().stats()
+
+
+def test_add_hook():
+    """Hooks should be called after each phase and handler call."""
+    phases = []
+    calls = []
+    validator = TOMLValidator(TOMLSchema({"name": str, "table": {"age": int}}))
+    validator.add_hook(on_phase=lambda phase, duration: phases.append(phase))
+    validator.add_hook(
+        on_handler=lambda key, pattern, duration, result: calls.append(
+            (key, pattern, duration >= 0, result)
+        )
+    )
+
+    validator.validate({"name": 1, "table": {"age": 1}})
+    assert phases == ["mapping", "mapping", "walk", "missing"]
+    assert calls == [
+        ("name", "name", True, "incorrect-type"),
+        ("table.age", "table.age", True, False),
+    ]
+
+    with pytest.raises(TypeError):
+        validator.add_hook()
+    with pytest.raises(TypeError):
+        validator.add_hook(on_phase="not-callable")
+
+
+def test_handlers_merged_like_flatten():
+    """Handlers should be merged like flattening them with the schema."""
+    schemas = [
+        {"name": {"port": [int]}, "host": str},
+        {"name": {"port": int}, "tags": [str]},
+        {"name": str, "tags": [str], "servers": [{"host": str}]},
+        {"name": {"port": int}},
+    ]
+    handlers = [
+        {"name.port": int},
+        {"name.host": str, "other": int},
+        {"*.host": str},
+        {"name": str},
+    ]
+
+    for raw in schemas:
+        for _handlers in handlers:
+            plan = TOMLValidator(TOMLSchema(raw), _handlers).compile()
+            expected = flatten({**raw, **_handlers}, method="schema")
+            assert dict(plan.handlers) == expected
+            assert list(plan.handlers) == list(expected)
+
+
+def test_codegen():
+    """A generated walker should find the same errors in the same order."""
+    schema = TOMLSchema(
+        {
+            "name": str,
+            "code": re.compile(r"[a-z]+"),
+            "port": lambda value: value < 0 and "negative",
+            "servers": [{"host": str}],
+            "table": {"key": int},
+        }
+    )
+    handlers = {"table.*": float}
+    data = {
+        "name": 1,
+        "code": "ABC",
+        "port": -1,
+        "servers": [{"host": 1, "tags": ["a", 1]}, {"other": 2}, 3],
+        "table": {"key": "1", "other": 1},
+        "unknown": {"name": 1},
+    }
+
+    generic = TOMLValidator(schema, handlers)
+    validator = TOMLValidator(schema, handlers, codegen=True)
+    assert "def " in validator.compile().source
+    assert generic.compile().source is None
+    assert list(validator.iter_errors(data)) == list(generic.iter_errors(data))
+
+    # The source is removed from linecache with the plan
+    filenames = set(linecache.cache)
+    validator.add_handler("other", int)
+    validator.compile()
+    assert len(set(linecache.cache) - filenames) == 1
+    del validator
+    gc.collect()
+    assert not set(linecache.cache) - filenames
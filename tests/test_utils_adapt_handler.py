@@ -0,0 +1,152 @@
+""" Tests for the 'tomlval.utils.adapt_handler' module. """
+
+import asyncio
+import re
+
+import pytest
+
+from tomlval.errors import TOMLHandlerError
+from tomlval.types import HandlerKind
+from tomlval.utils.adapt_handler import adapt_handler, classify_handler
+
+
+def on_type_mismatch(key, expected, got):
+    """Type mismatch callback returning its arguments."""
+    return ("type", key, expected, got)
+
+
+def on_pattern_mismatch(key, value, pattern):
+    """Pattern mismatch callback returning its arguments."""
+    return ("pattern", key, value)
+
+
+def adapt(handler):
+    """Adapt a handler with the test callbacks."""
+    return adapt_handler(handler, on_type_mismatch, on_pattern_mismatch)
+
+
+@pytest.mark.parametrize(
+    "handler, kind",
+    [
+        (int, HandlerKind.TYPE),
+        ((int, float), HandlerKind.TYPES),
+        ((str, lambda value: None), HandlerKind.COMPOSITE),
+        ([int], HandlerKind.ARRAY),
+        (re.compile(r"\d+"), HandlerKind.PATTERN),
+        (lambda: None, HandlerKind.CALL),
+        (lambda key: None, HandlerKind.CALL_KEY),
+        (lambda value: None, HandlerKind.CALL_VALUE),
+        (lambda key, value: None, HandlerKind.CALL_KEY_VALUE),
+        (lambda value, key: None, HandlerKind.CALL_KEY_VALUE),
+        (lambda values: None, HandlerKind.BATCH),
+        ("not-a-handler", HandlerKind.NONE),
+    ],
+)
+def test_classify_handler(handler, kind):
+    """Handlers should be tagged by how they are called."""
+    assert classify_handler(handler) is kind
+
+
+def test_classify_invalid_function():
+    """Functions with unexpected parameters should be rejected."""
+    with pytest.raises(TOMLHandlerError):
+        classify_handler(lambda other: None)
+    with pytest.raises(TOMLHandlerError):
+        classify_handler(lambda key, value, other: None)
+
+
+def test_type_adapters():
+    """Type and tuple-of-type adapters should check the value type."""
+    assert not adapt(int)("key", 1)
+    assert adapt(int)("key", "1") == ("type", "key", int, str)
+    assert not adapt((int, float))("key", 1.5)
+    assert adapt((int, float))("key", "1") == ("type", "key", (int, float), str)
+
+
+def test_pattern_adapter():
+    """Pattern adapters should check type and full match."""
+    adapter = adapt(re.compile(r"\d+"))
+    assert not adapter("key", "123")
+    assert adapter("key", "12a") == ("pattern", "key", "12a")
+    assert adapter("key", 123) == ("type", "key", "str", int)
+
+
+def test_composite_adapter():
+    """Composite adapters should check the types, then every other handler."""
+    adapter = adapt((str, lambda value: "short" if len(value) < 3 else None))
+    assert not adapter("key", "long")
+    assert adapter("key", "ab") == "short"
+    assert adapter("key", 1) == ("type", "key", (str,), int)
+
+
+def test_array_adapter():
+    """Array adapters should check every element."""
+    adapter = adapt([int, float])
+    assert not adapter("key", [1, 2.5])
+    assert adapter("key", [1, "2"]) == ("type", "key", (int, float), str)
+    assert adapter("key", 1) == ("type", "key", list, int)
+
+
+def test_array_adapter_bulk():
+    """Arrays of types should report the first element that fails."""
+    adapter = adapt([int])
+    value = list(range(10000))
+    assert not adapter("key", value)
+    assert adapter.check(value) is None
+
+    value[5000] = 1.5
+    value[7000] = "2"
+    assert adapter("key", value) == ("type", "key", (int,), float)
+    assert adapter.check(value)("key") == ("type", "key", (int,), float)
+
+    # Falsy mismatches should continue with the next element
+    quiet = adapt_handler(
+        [int],
+        lambda key, expected, got: got is str and got,
+        on_pattern_mismatch,
+    )
+    assert quiet("key", value) is str
+
+
+def test_function_adapters():
+    """Function adapters should pass the parameters they declare."""
+    assert adapt(lambda: "static")("key", 1) == "static"
+    assert adapt(lambda key: key)("key", 1) == "key"
+    assert adapt(lambda value: value)("key", 1) == 1
+    assert adapt(lambda key, value: (key, value))("key", 1) == ("key", 1)
+    assert adapt(lambda value, key: (key, value))("key", 1) == ("key", 1)
+
+
+def test_async_adapters():
+    """Async adapters should only run when awaited."""
+
+    async def handler(value):
+        return "negative" if value < 0 else None
+
+    adapter = adapt((int, handler))
+    assert adapt(handler).acall is not None
+    assert adapt(lambda value: None).acall is None
+    assert asyncio.run(adapter.acall("key", -1)) == "negative"
+    assert asyncio.run(adapter.acall("key", "1")) == (
+        "type",
+        "key",
+        (int,),
+        str,
+    )
+    with pytest.raises(TOMLHandlerError):
+        adapter("key", 1)
+
+
+def test_batch_adapters():
+    """Batch adapters should check every value at once, by index."""
+    adapter = adapt(lambda values: {1: "odd"} if len(values) > 1 else [])
+    assert adapter.batch is not None
+    assert adapter.batch([2, 3, 4]) == [(1, "odd")]
+    assert adapter.batch([1, 2]) == [(1, "odd")]
+    assert not adapter("key", 1)
+    assert adapt(lambda values: [None, "bad"]).batch([1, 2]) == [(1, "bad")]
+    assert adapt(lambda value: None).batch is None
+    with pytest.raises(TOMLHandlerError):
+        adapt(lambda values: {5: "bad"}).batch([1])
+    with pytest.raises(TOMLHandlerError):
+        adapt(lambda values: "bad").batch([1])
@@ -0,0 +1,37 @@
+""" Tests for the 'tomlval.utils.fingerprint' module. """
+
+import re
+
+from tomlval.utils.fingerprint import fingerprint
+
+
+def _helper(value):
+    """Helper called by a handler."""
+    return value > 0
+
+
+def test_fingerprint():
+    """Equal schemas should have equal fingerprints."""
+    assert fingerprint({"a": int, "b": re.compile("x")}) == fingerprint(
+        {"a": int, "b": re.compile("x")}
+    )
+    assert fingerprint({"a": int}) != fingerprint({"a": float})
+    assert fingerprint(lambda value: 1) != fingerprint(lambda value: 2)
+
+
+def test_fingerprint_globals():
+    """Changing a helper a handler calls should change the fingerprint."""
+    global _helper  # pylint: disable=global-statement
+
+    def handler(value):
+        return _helper(value)
+
+    before = fingerprint(handler)
+    original = _helper
+    try:
+        _helper = lambda value: value < 0
+        assert fingerprint(handler) != before
+    finally:
+        _helper = original
+    assert fingerprint(handler) == before
+    assert fingerprint(object()) == fingerprint(object())
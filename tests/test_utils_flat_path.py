@@ -0,0 +1,36 @@
+""" Tests for the 'tomlval.utils.flat_path' module. """
+
+from tomlval.utils.flat_path import FlatPath
+from tomlval.utils.unflatten import unflatten
+
+
+def test_parse():
+    """Keys should be parsed into segments, with integer indexes."""
+    path = FlatPath.parse("arr.[0].inner.[12].name")
+    assert path == ("arr", 0, "inner", 12, "name")
+    assert path.key == "arr.[0].inner.[12].name"
+    assert FlatPath.parse(["arr", 0, "inner", 12, "name"]) == path
+
+
+def test_interned():
+    """Parsing the same key again should return the same path."""
+    path = FlatPath.parse("table.arr.[3].key")
+    assert FlatPath.parse("table.arr.[3].key") is path
+    assert FlatPath.parse(path) is path
+
+
+def test_normalized():
+    """Array indexes should be folded or removed in the normalized forms."""
+    path = FlatPath.parse("arr.[0].inner.[1].name")
+    assert path.shape == ("arr[]", "inner[]", "name")
+    assert path.pattern == "arr[].inner[].name"
+    assert path.bare == "arr.inner.name"
+    assert FlatPath.parse("key").shape == ("key",)
+
+
+def test_unflatten():
+    """Flattened keys should be unflattened into tables and arrays."""
+    assert unflatten({"a.b": 1, "arr.[1].name": "x", "arr.[0].name": "y"}) == {
+        "a": {"b": 1},
+        "arr": [{"name": "y"}, {"name": "x"}],
+    }
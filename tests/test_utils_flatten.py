@@ -0,0 +1,40 @@
+""" Tests for the 'tomlval.utils.flatten' module. """
+
+from tomlval.utils.flatten import flatten, flatten_all
+
+
+def test_flatten_all():
+    """Lists should be flattened into indexed keys."""
+    data = {"a": 1, "t": {"b": [1, 2]}, "arr": [{"x": 1}, 3]}
+    assert flatten_all(data) == {
+        "a": 1,
+        "t.b.[0]": 1,
+        "t.b.[1]": 2,
+        "arr.[0].x": 1,
+        "arr.[1]": 3,
+    }
+
+
+def test_flatten_lists():
+    """Scalar list items should be grouped, after the other keys."""
+    data = {"t": {"b": [1, 2]}, "arr": [{"x": 1}, 3, {"y": [4]}], "c": 5}
+    flat = flatten(data)
+    assert flat == {
+        "arr.[0].x": 1,
+        "c": 5,
+        "t.b": [1, 2],
+        "arr": [3],
+        "arr.[2].y": [4],
+    }
+    assert list(flat) == ["arr.[0].x", "c", "t.b", "arr", "arr.[2].y"]
+
+
+def test_flatten_deep():
+    """Deeply nested tables should not be limited by recursion."""
+    data = node = {}
+    for _ in range(5000):
+        node["n"] = node = {}
+    node["leaf"] = [1]
+
+    assert list(flatten_all(data).values()) == [1]
+    assert list(flatten(data).values()) == [[1]]
@@ -0,0 +1,16 @@
+""" Tests for the 'tomlval.utils.format_key' module. """
+
+from tomlval.utils.format_key import format_key
+
+
+def test_format_path():
+    """Paths should be formatted like flattened keys."""
+    assert format_key(["key"]) == "key"
+    assert format_key(("table", "key")) == "table.key"
+    assert format_key(["arr", 0, "name"]) == "arr.[0].name"
+    assert format_key(["arr", 1, "inner", 2, "name"]) == "arr.[1].inner.[2].name"
+
+
+def test_format_string():
+    """Formatted keys should be returned as-is."""
+    assert format_key("arr.[0].name") == "arr.[0].name"
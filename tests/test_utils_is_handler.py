@@ -1,6 +1,7 @@
 """ Tests for the 'toml_parser.utils.is_toml' module. """
 
 from tomlval.utils.is_handler import is_handler
+from tomlval.utils.markers import batch
 
 
 def test_valid_named_handlers():
@@ -77,3 +78,25 @@ def test_invalid_lambda_handlers():
     assert is_handler(lambda key1, key2: None) == (
         "Function has invalid parameters 'key1', 'key2'."
     )
+
+
+def test_batch_handlers():
+    """Test if the 'is_handler' function identifies batch handlers."""
+
+    @batch
+    def marked_batch_handler(ports):
+        """Marked batch handler."""
+
+    @batch
+    def invalid_batch_handler(key, value):
+        """Marked batch handler with two parameters."""
+
+    assert is_handler(lambda values: None) == ""
+    assert is_handler(marked_batch_handler) == ""
+    assert (
+        is_handler(invalid_batch_handler)
+        == "Batch handler must have 1 parameter."
+    )
+    assert is_handler(invalid_batch_handler, "ports") == (
+        "Key 'ports' is a batch handler without 1 parameter."
+    )
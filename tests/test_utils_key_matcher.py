@@ -0,0 +1,119 @@
+""" Tests for the 'tomlval.utils.key_matcher' module. """
+
+import random
+import re
+
+import pytest
+
+from tomlval.utils.key_matcher import KeyMatcher
+
+
+def linear_match(patterns, key):
+    """The reference implementation the matcher replaces."""
+    if key in patterns:
+        return key
+
+    best_specificity = -1
+    best_wildcard_count = float("inf")
+    matched = None
+
+    for pattern in patterns:
+        if "*" in pattern:
+            regex = "^" + re.escape(pattern).replace("\\*", ".*") + "$"
+            if re.fullmatch(regex, key):
+                specificity = len(pattern.replace("*", ""))
+                wildcard_count = pattern.count("*")
+                if specificity > best_specificity or (
+                    specificity == best_specificity
+                    and wildcard_count < best_wildcard_count
+                ):
+                    best_specificity = specificity
+                    best_wildcard_count = wildcard_count
+                    matched = pattern
+
+    return matched
+
+
+@pytest.mark.parametrize(
+    "key, expected",
+    [
+        ("user.name", "user.name"),
+        ("user.first_name", "user.*_name"),
+        ("user.age", "user.*"),
+        ("user.address.street", "user.*"),
+        ("first_name", "*_name"),
+        ("anything", "*"),
+        ("users[].name", "users[].*"),
+    ],
+)
+def test_priority(key, expected):
+    """The most specific pattern should win."""
+    matcher = KeyMatcher(
+        ["*", "*_name", "user.*", "user.*_name", "user.name", "users[].*"]
+    )
+    assert matcher.match(key) == expected
+
+
+def test_no_match():
+    """Keys without a matching pattern should resolve to None."""
+    matcher = KeyMatcher(["user.*", "name"])
+    assert matcher.match("age") is None
+    assert matcher.match("user") is None
+
+
+def test_segment_wildcards():
+    """In segment mode, a wildcard should only match a single segment."""
+    matcher = KeyMatcher(["user.*"], segment_wildcards=True)
+    assert matcher.match("user.name") == "user.*"
+    assert matcher.match("user.address.street") is None
+
+
+def test_equivalent_to_linear_scan():
+    """The matcher should agree with a linear scan over all patterns."""
+    rng = random.Random(0)
+    words = ["a", "b", "ab", "x_name", "arr[]", "*", "*_name", "a*", "*b"]
+
+    for _ in range(50):
+        patterns = list(
+            dict.fromkeys(
+                ".".join(rng.choices(words, k=rng.randint(1, 3)))
+                for _ in range(20)
+            )
+        )
+        matcher = KeyMatcher(patterns)
+        for _ in range(50):
+            key = ".".join(
+                rng.choices(
+                    ["a", "b", "ab", "x_name", "arr[]", "ba"],
+                    k=rng.randint(1, 4),
+                )
+            )
+            assert matcher.match(key) == linear_match(patterns, key), key
+
+
+def test_match_all():
+    """Every matching pattern should be found."""
+    rng = random.Random(0)
+    words = ["a", "b", "ab", "x_name", "arr[]", "*", "*_name", "a*", "*b"]
+
+    for _ in range(50):
+        patterns = list(
+            dict.fromkeys(
+                ".".join(rng.choices(words, k=rng.randint(1, 3)))
+                for _ in range(20)
+            )
+        )
+        matcher = KeyMatcher(patterns)
+        for _ in range(50):
+            key = ".".join(
+                rng.choices(
+                    ["a", "b", "ab", "x_name", "arr[]", "ba"],
+                    k=rng.randint(1, 4),
+                )
+            )
+            expected = {
+                p
+                for p in patterns
+                if re.fullmatch(re.escape(p).replace("\\*", ".*"), key)
+            }
+            assert matcher.match_all(key) == expected, key
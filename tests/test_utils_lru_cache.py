@@ -0,0 +1,43 @@
+""" Tests for the 'tomlval.utils.lru_cache' module. """
+
+import pytest
+
+from tomlval.utils.lru_cache import LRUCache
+
+
+def test_get_or_call():
+    """Values should be created once and counted as hits afterwards."""
+    cache = LRUCache(2)
+    calls = []
+
+    def create(value):
+        calls.append(value)
+        return value * 2
+
+    assert cache.get_or_call("a", create, 1) == 2
+    assert cache.get_or_call("a", create, 1) == 2
+    assert calls == [1]
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_eviction():
+    """The least recently used entry should be evicted."""
+    cache = LRUCache(2)
+    cache.get_or_call("a", lambda: 1)
+    cache.get_or_call("b", lambda: 2)
+    cache.get_or_call("a", lambda: 1)
+    cache.get_or_call("c", lambda: 3)
+
+    assert len(cache) == 2
+    assert cache.get_or_call("a", lambda: None) == 1
+    assert cache.get_or_call("b", lambda: None) is None
+
+    cache.clear()
+    assert len(cache) == 0
+    assert (cache.hits, cache.misses) == (0, 0)
+
+
+def test_invalid_maxsize():
+    """The cache should hold at least one entry."""
+    with pytest.raises(ValueError):
+        LRUCache(0)
@@ -1,5 +1,10 @@
 """ toml_parser package """
 
 from .errors import *
+from .toml_file_cache import TOMLFileCache
+from .toml_profiler import TOMLProfiler
 from .toml_schema import TOMLSchema
+from .toml_schema_cache import TOMLSchemaCache
+from .toml_session import TOMLSession
 from .toml_validator import TOMLValidator
+from .utils.markers import batch, expensive, pure
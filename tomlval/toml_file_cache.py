@@ -0,0 +1,146 @@
+"""Module for caching the validation results of TOML files."""
+
+import os
+import pathlib
+import pickle
+from typing import Any, Dict, NamedTuple, Tuple
+
+from tomlval.types import PathOrStr
+from tomlval.utils import to_path
+
+_CACHE_VERSION = 1
+
+
+class TOMLFileCacheEntry(NamedTuple):
+    """A cached validation result for a single file."""
+
+    mtime_ns: int
+    size: int
+    digest: str
+    errors: dict
+
+
+class TOMLFileCache:
+    """
+    A cache of validation results for TOML files.
+
+    Entries are keyed by the fingerprint of the validator and the path of
+    the file, and store the modification time, size and content hash of
+    the file when it was validated. The cache is kept in memory, and is
+    optionally persisted to a file, so unchanged files can be skipped
+    between runs.
+
+    The fingerprint covers the code of the handlers and the globals they
+    refer to, but not the code of modules or class methods they call.
+    Clear the cache when such code changes.
+    """
+
+    def __init__(self, path: PathOrStr | None = None):
+        """
+        Initialize a new file cache.
+
+        Args:
+            path?: PathOrStr | None - The file to persist the cache to. If
+            the file exists, the cache is loaded from it.
+        Returns:
+            None
+        Raises:
+            TypeError - If the path is not a string or pathlib.Path object.
+        """
+        self._path = None if path is None else to_path(path)
+        self._entries: Dict[Tuple[str, str], TOMLFileCacheEntry] = {}
+
+        if self._path is not None and self._path.is_file():
+            self._entries = self._load(self._path)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __repr__(self) -> str:
+        return f"<TOMLFileCache entries={len(self)}>"
+
+    @staticmethod
+    def _load(path: pathlib.Path) -> Dict[Tuple[str, str], Any]:
+        """Load the entries from a file, ignoring unreadable caches."""
+        try:
+            with path.open("rb") as file:
+                version, entries = pickle.load(file)
+        except Exception:
+            return {}
+
+        if version != _CACHE_VERSION or not isinstance(entries, dict):
+            return {}
+
+        return entries
+
+    def get(
+        self, fingerprint: str, path: pathlib.Path
+    ) -> TOMLFileCacheEntry | None:
+        """
+        Get the cached entry of a file.
+
+        Args:
+            fingerprint: str - The fingerprint of the validator.
+            path: pathlib.Path - The path of the file.
+        Returns:
+            TOMLFileCacheEntry | None - The entry, if any.
+        Raises:
+            None
+        """
+        return self._entries.get((fingerprint, str(path)))
+
+    def set(
+        self,
+        fingerprint: str,
+        path: pathlib.Path,
+        entry: TOMLFileCacheEntry,
+    ) -> None:
+        """
+        Set the cached entry of a file.
+
+        Args:
+            fingerprint: str - The fingerprint of the validator.
+            path: pathlib.Path - The path of the file.
+            entry: TOMLFileCacheEntry - The entry to cache.
+        Returns:
+            None
+        Raises:
+            None
+        """
+        self._entries[(fingerprint, str(path))] = entry
+
+    def clear(self) -> None:
+        """
+        Remove all entries from the cache.
+
+        Args:
+            None
+        Returns:
+            None
+        Raises:
+            None
+        """
+        self._entries.clear()
+
+    def save(self) -> None:
+        """
+        Persist the cache to its file, if it has one.
+
+        Args:
+            None
+        Returns:
+            None
+        Raises:
+            OSError - If the file cannot be written.
+            pickle.PicklingError - If an error cannot be pickled.
+        """
+        if self._path is None:
+            return
+
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = self._path.with_name(
+            f".{self._path.name}.{os.getpid()}.tmp"
+        )
+        with temp_path.open("wb") as file:
+            pickle.dump((_CACHE_VERSION, self._entries), file)
+        temp_path.replace(self._path)
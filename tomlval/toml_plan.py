@@ -0,0 +1,898 @@
+"""Module for compiling a schema and handlers into a validation plan."""
+
+from asyncio import Semaphore, gather, get_running_loop
+from collections import Counter
+from concurrent.futures import Executor, Future
+from itertools import repeat
+from time import perf_counter
+from types import MappingProxyType
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Collection,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Sequence,
+    Set,
+    Tuple,
+)
+
+from tomlval.toml_schema import TOMLSchema
+from tomlval.types import Handler
+from tomlval.utils import (
+    ColumnWalker,
+    FlatPath,
+    HandlerAdapter,
+    KeyMatcher,
+    LRUCache,
+    SubtreeWalker,
+    adapt_handler,
+    fingerprint,
+    flatten,
+    format_key,
+    generate_walker,
+    is_pure,
+)
+
+_RESOLVED_CACHE_SIZE = 65536
+
+# The number of tables from which arrays are walked column by column
+_COLUMNAR_MIN_TABLES = 16
+
+# The (on_phase, on_handler) hooks of a plan
+TOMLHook = Tuple[
+    Callable[[str, float], Any] | None,
+    Callable[[str, str, float, Any], Any] | None,
+]
+
+
+class TOMLPlan:
+    """
+    An immutable validation plan.
+
+    The plan holds everything that only depends on the schema and the
+    handlers, so that validating a document only performs per-document work.
+    """
+
+    def __init__(
+        self,
+        schema: TOMLSchema,
+        handlers: dict,
+        on_missing: Callable[..., Any],
+        on_type_mismatch: Callable[..., Any],
+        on_pattern_mismatch: Callable[..., Any],
+        segment_wildcards: bool = False,
+        executor: Executor | None = None,
+        memo: LRUCache | None = None,
+        memoize: bool = False,
+        memoize_subtrees: bool = False,
+        hooks: Sequence[TOMLHook] = (),
+        codegen: bool = False,
+    ):
+        """
+        Compile a new validation plan.
+
+        Args:
+            schema: TOMLSchema - The schema to validate against.
+            handlers: dict - The custom handlers of the validator.
+            on_missing: Callable[..., Any] - The missing key
+            callback of the validator.
+            on_type_mismatch: Callable[..., Any] - The type mismatch
+            callback of the validator.
+            on_pattern_mismatch: Callable[..., Any] - The pattern mismatch
+            callback of the validator.
+            segment_wildcards?: bool - Whether a wildcard only
+            matches a single dotted segment.
+            executor?: Executor | None - The executor that runs
+            expensive handlers.
+            memo?: LRUCache | None - The cache of pure handler results.
+            memoize?: bool - Whether every handler is treated as pure.
+            memoize_subtrees?: bool - Whether to cache the failures of
+            tables in the memo cache, by their shape and content.
+            hooks?: Sequence[TOMLHook] - The (on_phase, on_handler)
+            hooks that are called after each phase and handler call.
+            codegen?: bool - Whether to generate a walker specialized
+            for the handlers, unless subtrees are memoized.
+        Returns:
+            None
+        Raises:
+            TOMLSchemaError - If the schema is invalid.
+            TOMLSchemaMergeError - If the handlers cannot be merged.
+            TOMLHandlerError - If a handler has invalid parameters.
+        """
+        schema.validate_schema()
+        self._schema = schema
+        self._on_missing = on_missing
+        self._fingerprint_parts = (
+            on_missing,
+            on_type_mismatch,
+            on_pattern_mismatch,
+            segment_wildcards,
+        )
+        self._fingerprint: str | None = None
+        self._executor = executor
+        self._handlers = MappingProxyType(_merge_handlers(schema, handlers))
+
+        # Wildcard matcher
+        self._matcher = KeyMatcher(
+            self._handlers, segment_wildcards=segment_wildcards
+        )
+
+        # Call adapters, shared by the patterns of the same handler, except
+        # for batch handlers, which collect the values of their pattern
+        adapters: Dict[int, HandlerAdapter] = {}
+        by_pattern: Dict[str, HandlerAdapter] = {}
+        for pattern, handler in self._handlers.items():
+            adapter = adapters.get(id(handler))
+            if adapter is None or adapter.batch is not None:
+                adapter = adapters[id(handler)] = adapt_handler(
+                    handler,
+                    on_type_mismatch,
+                    on_pattern_mismatch,
+                    memo,
+                    memoize,
+                )
+            by_pattern[pattern] = adapter
+        self._adapters = MappingProxyType(by_pattern)
+
+        # Hooks
+        self._on_phase = _chain(h[0] for h in hooks)
+        if (on_handler := _chain(h[1] for h in hooks)) is not None:
+            self._adapters = MappingProxyType(
+                {
+                    pattern: _hook_adapter(adapter, pattern, on_handler)
+                    for pattern, adapter in self._adapters.items()
+                }
+            )
+
+        # Expensive handlers are only deferred if they can be offloaded
+        self._defer_expensive = executor is not None and any(
+            a.expensive for a in self._adapters.values()
+        )
+
+        # Batch handlers are deferred until every value has been found
+        self._batched = any(
+            a.batch is not None for a in self._adapters.values()
+        )
+        self._defers_calls = any(
+            a.acall is not None or a.expensive for a in self._adapters.values()
+        )
+
+        # Resolved adapters by array-normalized path
+        self._resolved: Dict[Tuple[str, ...], HandlerAdapter | None] = {}
+
+        # Column and subtree walkers
+        self._walk_columns = ColumnWalker(self._resolve_shape, self._walk)
+        self._walk_table = (
+            SubtreeWalker(memo, self._resolve_shape, self._walk)
+            if memo is not None and memoize_subtrees
+            else self._walk
+        )
+
+        # Generated walker, which would bypass the subtree memoization
+        self._source: str | None = None
+        self._generated: Callable[..., Iterator[Tuple[str, Any]]] | None = None
+        if codegen and not isinstance(self._walk_table, SubtreeWalker):
+            self._generated, self._source = generate_walker(
+                self._handlers,
+                self._resolve_shape,
+                self._walk_table,
+                on_type_mismatch,
+                on_pattern_mismatch,
+                inline=lambda adapter: on_handler is None
+                and not (
+                    memo is not None and (memoize or is_pure(adapter.handler))
+                ),
+            )
+
+    def __repr__(self) -> str:
+        return f"<TOMLPlan handlers={len(self._handlers)}>"
+
+    @property
+    def schema(self) -> TOMLSchema:
+        """The schema the plan was compiled from."""
+        return self._schema
+
+    @property
+    def handlers(self) -> Mapping[str, Handler]:
+        """The flattened handlers of the plan."""
+        return self._handlers
+
+    @property
+    def adapters(self) -> Mapping[str, HandlerAdapter]:
+        """The call adapter of each handler."""
+        return self._adapters
+
+    @property
+    def source(self) -> str | None:
+        """The source of the generated walker, if codegen is enabled."""
+        return self._source
+
+    @property
+    def fingerprint(self) -> str:
+        """A stable hash of the handlers and callbacks of the plan."""
+        if self._fingerprint is None:
+            self._fingerprint = fingerprint(
+                (dict(self._handlers), *self._fingerprint_parts)
+            )
+        return self._fingerprint
+
+    @property
+    def batched(self) -> bool:
+        """Whether the plan has batch handlers."""
+        return self._batched
+
+    @property
+    def required_keys(self) -> frozenset:
+        """The keys that must be present in the data."""
+        return self._schema.required_keys
+
+    @property
+    def optional_keys(self) -> frozenset:
+        """The keys that may be omitted from the data."""
+        return self._schema.optional_keys
+
+    def match(self, key: str) -> str | None:
+        """
+        Find the most specific handler pattern for a flattened key.
+
+        Args:
+            key: str - The flattened data key.
+        Returns:
+            str | None - The matching handler pattern, if any.
+        Raises:
+            None
+        """
+        return self._matcher.match(FlatPath.parse(key).pattern)
+
+    def resolve(self, key: str) -> HandlerAdapter | None:
+        """
+        Find the call adapter of the most specific handler for a key.
+
+        Args:
+            key: str - The flattened data key.
+        Returns:
+            HandlerAdapter | None - The call adapter, if any.
+        Raises:
+            None
+        """
+        pattern = self.match(key)
+        return None if pattern is None else self._adapters[pattern]
+
+    def _resolve_shape(self, shape: Tuple[str, ...]) -> HandlerAdapter | None:
+        """Find the call adapter for an array-normalized path."""
+        try:
+            return self._resolved[shape]
+        except KeyError:
+            pass
+
+        start = perf_counter()
+        pattern = self._matcher.match(".".join(shape))
+        adapter = None if pattern is None else self._adapters[pattern]
+
+        if self._on_phase is not None:
+            self._on_phase("mapping", perf_counter() - start)
+
+        if len(self._resolved) >= _RESOLVED_CACHE_SIZE:
+            self._resolved.clear()
+        self._resolved[shape] = adapter
+
+        return adapter
+
+    def _walk(
+        self,
+        node: dict,
+        path: List[str | int],
+        shape: Tuple[str, ...],
+        provided: Set[Tuple[str, ...]],
+        defer: (
+            Callable[[List[str | int], HandlerAdapter, Any], None] | None
+        ) = None,
+    ) -> Iterator[Tuple[str, Any]]:
+        """
+        Walk a table, running the handler of each value.
+
+        The path holds the segments of the current table, including array
+        indexes, while the shape holds the same segments with array
+        indexes folded into the key as '[]', which is used for matching.
+        If defer is set, async and expensive handlers are passed to it
+        instead of being called.
+        """
+        for key, value in node.items():
+            # Table
+            if isinstance(value, dict):
+                path.append(key)
+                yield from self._walk_table(
+                    value, path, shape + (key,), provided, defer
+                )
+                path.pop()
+                continue
+
+            # Array
+            if isinstance(value, list):
+                if not value:
+                    continue
+
+                # Arrays without tables are validated as they are
+                if any(map(isinstance, value, repeat(dict))):
+                    scalars = []
+                    path.append(key)
+                    _shape = shape + (f"{key}[]",)
+                    if self._columnar(value, defer):
+                        # Tables are taken as they are checked
+                        tables = (
+                            (idx, item)
+                            for idx, item in enumerate(value)
+                            if isinstance(item, dict)
+                        )
+                        yield from self._walk_columns(
+                            tables, path, _shape, provided, defer
+                        )
+                        scalars = [
+                            item for item in value if not isinstance(item, dict)
+                        ]
+                    else:
+                        for idx, item in enumerate(value):
+                            if isinstance(item, dict):
+                                path.append(idx)
+                                yield from self._walk_table(
+                                    item, path, _shape, provided, defer
+                                )
+                                path.pop()
+                            else:
+                                scalars.append(item)
+                    path.pop()
+
+                    # Arrays are validated by their scalar values
+                    if not scalars:
+                        continue
+                    value = scalars
+
+            # Value
+            _shape = shape + (key,)
+            provided.add(_shape)
+
+            if (adapter := self._resolve_shape(_shape)) is None:
+                continue
+
+            path.append(key)
+            if defer is not None and (
+                adapter.acall is not None
+                or adapter.expensive
+                or adapter.batch is not None
+            ):
+                defer(path, adapter, value)
+            elif result := adapter.call(path, value):
+                yield format_key(path), result
+            path.pop()
+
+    def _columnar(
+        self,
+        array: list,
+        defer: Callable[[List[str | int], HandlerAdapter, Any], None] | None,
+    ) -> bool:
+        """
+        Check if an array of tables is walked column by column, which
+        only defers batch handlers, since the other deferred handlers
+        reserve their position in the errors.
+        """
+        return (
+            (defer is None or not self._defers_calls)
+            and not isinstance(self._walk_table, SubtreeWalker)
+            and len(array) >= _COLUMNAR_MIN_TABLES
+        )
+
+    def iter_errors(self, data: dict) -> Iterator[Tuple[str, Any]]:
+        """
+        Lazily validate a document, yielding each error as it is found.
+
+        The document is walked once, without being flattened. Keys are
+        only formatted when a handler needs them or an error is reported.
+
+        If the plan has an executor, expensive handlers are submitted to
+        it while the document is walked, and the errors are yielded in
+        document order once the walk is done.
+
+        Batch handlers are run once the walk is done, with every value
+        of their pattern, and their errors are yielded after the errors
+        of the other handlers.
+
+        Args:
+            data: dict - The TOML data to validate.
+        Returns:
+            Iterator[Tuple[str, Any]] - The key and error of each error.
+        Raises:
+            TOMLHandlerError - If any of the handlers are invalid.
+        """
+        provided: Set[Tuple[str, ...]] = set()
+
+        # Handlers
+        if self._defer_expensive or self._batched:
+            errors = self._iter_deferred(data, [], (), provided)
+        elif self._generated is not None:
+            errors = self._generated(data, [], provided)
+        else:
+            errors = self._walk_table(data, [], (), provided)
+
+        # Missing keys
+        def _missing() -> Iterator[Tuple[str, Any]]:
+            yield from self.iter_missing(
+                {".".join(s).replace("[]", "") for s in provided}, data
+            )
+
+        if self._on_phase is None:
+            yield from errors
+            yield from _missing()
+        else:
+            yield from self._time_phase("walk", errors)
+            yield from self._time_phase("missing", _missing())
+
+    def _time_phase(
+        self, phase: str, errors: Iterator[Tuple[str, Any]]
+    ) -> Iterator[Tuple[str, Any]]:
+        """Time a phase, excluding the time spent by the consumer."""
+        elapsed = 0.0
+        start = perf_counter()
+        try:
+            for error in errors:
+                elapsed += perf_counter() - start
+                yield error
+                start = perf_counter()
+            elapsed += perf_counter() - start
+        finally:
+            self._on_phase(phase, elapsed)
+
+    def _iter_deferred(
+        self,
+        node: dict,
+        path: List[str | int],
+        shape: Tuple[str, ...],
+        provided: Set[Tuple[str, ...]],
+        found: Set[HandlerAdapter] | None = None,
+    ) -> Iterator[Tuple[str, Any]]:
+        """
+        Walk a table, running expensive handlers in the executor, if
+        there is one, and batch handlers once the walk is done. If found
+        is set, the adapters of the batch handlers are added to it
+        instead of being run.
+        """
+        results: List[Tuple[str, Any]] = []
+        futures: Dict[int, Future] = {}
+        batches = _Batches()
+
+        def _defer(
+            path: List[str | int], adapter: HandlerAdapter, value: Any
+        ) -> None:
+            if adapter.batch is not None:
+                batches.add(adapter, path, value)
+                return
+            key = format_key(path)
+            if self._executor is None:
+                results.append((key, adapter.call(key, value)))
+            else:
+                futures[len(results)] = self._executor.submit(
+                    adapter.call, key, value
+                )
+                results.append((key, None))
+
+        try:
+            # Deferred handlers reserve their position in the results
+            for error in self._walk_table(node, path, shape, provided, _defer):
+                results.append(error)
+            if found is None:
+                results.extend(batches.run())
+            else:
+                found.update(batches.values)
+
+            for idx, (key, result) in enumerate(results):
+                if idx in futures:
+                    result = futures.pop(idx).result()
+                if result:
+                    yield key, result
+        finally:
+            for future in futures.values():
+                future.cancel()
+
+    async def aiter_errors(
+        self, data: dict, concurrency: int | None = None
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Validate a document, running async handlers concurrently.
+
+        Synchronous handlers run inline while the document is walked,
+        while async handlers are gathered and awaited together, along
+        with expensive handlers running in the executor of the plan.
+        The errors are yielded in the same order as by 'iter_errors'
+        once every handler has finished.
+
+        Args:
+            data: dict - The TOML data to validate.
+            concurrency?: int | None - The maximum number of async
+            handlers running at once, unlimited if None.
+        Returns:
+            AsyncIterator[Tuple[str, Any]] - The key and error of
+            each error.
+        Raises:
+            TOMLHandlerError - If any of the handlers are invalid.
+        """
+        semaphore = None if concurrency is None else Semaphore(concurrency)
+        provided: Set[Tuple[str, ...]] = set()
+        results: List[Tuple[str, Any]] = []
+        jobs: List[Awaitable[None]] = []
+        batches = _Batches()
+
+        async def _call(adapter: HandlerAdapter, key: str, value: Any) -> Any:
+            if adapter.acall is not None:
+                return await adapter.acall(key, value)
+            return await get_running_loop().run_in_executor(
+                self._executor, adapter.call, key, value
+            )
+
+        async def _run(idx: int, adapter: HandlerAdapter, value: Any) -> None:
+            key = results[idx][0]
+            if semaphore is None:
+                results[idx] = key, await _call(adapter, key, value)
+                return
+            async with semaphore:
+                results[idx] = key, await _call(adapter, key, value)
+
+        def _defer(
+            path: List[str | int], adapter: HandlerAdapter, value: Any
+        ) -> None:
+            if adapter.batch is not None:
+                batches.add(adapter, path, value)
+                return
+            key = format_key(path)
+            if adapter.acall is None and self._executor is None:
+                results.append((key, adapter.call(key, value)))
+                return
+            results.append((key, None))
+            jobs.append(_run(len(results) - 1, adapter, value))
+
+        # Handlers
+        # Deferred handlers reserve their position in the results
+        for error in self._walk_table(data, [], (), provided, _defer):
+            results.append(error)
+        await gather(*jobs)
+        results.extend(batches.run())
+
+        for key, result in results:
+            if result:
+                yield key, result
+
+        # Missing keys
+        for error in self.iter_missing(
+            {".".join(s).replace("[]", "") for s in provided}, data
+        ):
+            yield error
+
+    def iter_missing(
+        self, provided_keys: Collection[str], data: dict | None = None
+    ) -> Iterator[Tuple[str, Any]]:
+        """
+        Yield an error for each required key that is not provided.
+
+        Args:
+            provided_keys: Collection[str] - The keys present in the data,
+            without array indexes.
+            data?: dict | None - The data, to check each table in
+            arrays of tables.
+        Returns:
+            Iterator[Tuple[str, Any]] - The key and error of each error.
+        Raises:
+            None
+        """
+        yield from self.iter_missing_errors(
+            self._schema.missing_keys(provided_keys, data)
+        )
+
+    def iter_missing_errors(
+        self, keys: Iterable[str]
+    ) -> Iterator[Tuple[str, Any]]:
+        """
+        Run the missing key callback for each missing key.
+
+        Args:
+            keys: Iterable[str] - The missing keys.
+        Returns:
+            Iterator[Tuple[str, Any]] - The key and error of each error.
+        Raises:
+            None
+        """
+        for k in keys:
+            if result := self._on_missing(k):
+                yield k, result
+
+    def iter_value_errors(
+        self,
+        value: Any,
+        path: Sequence[str | int],
+        found: Set[HandlerAdapter] | None = None,
+    ) -> Iterator[Tuple[str, Any]]:
+        """
+        Lazily validate a single value of a document, without checking
+        for missing keys. Batch handlers are run with the values found
+        in the value, unless found is set.
+
+        Args:
+            value: Any - The value to validate.
+            path: Sequence[str | int] - The path of the value in the
+            document. A path ending with an array index must point
+            to a table, and an empty path to the document itself.
+            found?: Set[HandlerAdapter] | None - If set, the adapters of
+            the batch handlers of the value are added to it, instead of
+            being run (see 'batch_errors').
+        Returns:
+            Iterator[Tuple[str, Any]] - The key and error of each error.
+        Raises:
+            TOMLHandlerError - If any of the handlers are invalid.
+        """
+        node, path = _value_table(value, path)
+        shape = FlatPath(path).shape
+
+        if self._batched:
+            yield from self._iter_deferred(node, path, shape, set(), found)
+        else:
+            yield from self._walk(node, path, shape, set())
+
+    def batch_adapters(
+        self, value: Any, path: Sequence[str | int]
+    ) -> Set[HandlerAdapter]:
+        """
+        Find the batch handlers that match a single value of a document,
+        without running any handler.
+
+        Args:
+            value: Any - The value.
+            path: Sequence[str | int] - The path of the value in the
+            document, like in 'iter_value_errors'.
+        Returns:
+            Set[HandlerAdapter] - The adapters of the batch handlers.
+        Raises:
+            None
+        """
+        batches = _Batches()
+        if self._batched:
+            node, path = _value_table(value, path)
+            self._collect_batches(node, path, FlatPath(path).shape, batches)
+        return set(batches.values)
+
+    def batch_errors(
+        self, data: dict, adapters: Collection[HandlerAdapter]
+    ) -> Dict[HandlerAdapter, Dict[str, Any]]:
+        """
+        Run batch handlers with every value they match in a document,
+        without running the other handlers.
+
+        Args:
+            data: dict - The TOML data.
+            adapters: Collection[HandlerAdapter] - The adapters of the
+            batch handlers to run.
+        Returns:
+            Dict[HandlerAdapter, Dict[str, Any]] - The errors of each
+            batch handler, which are empty if it matches no value.
+        Raises:
+            TOMLHandlerError - If any of the handlers are invalid.
+        """
+        batches = _Batches()
+        self._collect_batches(data, [], (), batches, adapters)
+
+        errors: Dict[HandlerAdapter, Dict[str, Any]] = {a: {} for a in adapters}
+        for adapter, (paths, values) in batches.values.items():
+            for idx, error in adapter.batch(values):
+                errors[adapter][format_key(paths[idx])] = error
+        return errors
+
+    def _collect_batches(
+        self,
+        node: dict,
+        path: List[str | int],
+        shape: Tuple[str, ...],
+        batches: "_Batches",
+        adapters: Collection[HandlerAdapter] | None = None,
+    ) -> None:
+        """
+        Add the values of the batch handlers in a table to the batches,
+        in the same order as '_walk', only for the given adapters if set.
+        """
+        for key, value in node.items():
+            # Table
+            if isinstance(value, dict):
+                path.append(key)
+                self._collect_batches(
+                    value, path, shape + (key,), batches, adapters
+                )
+                path.pop()
+                continue
+
+            # Array
+            if isinstance(value, list):
+                if not value:
+                    continue
+                if any(map(isinstance, value, repeat(dict))):
+                    scalars = []
+                    path.append(key)
+                    _shape = shape + (f"{key}[]",)
+                    for idx, item in enumerate(value):
+                        if isinstance(item, dict):
+                            path.append(idx)
+                            self._collect_batches(
+                                item, path, _shape, batches, adapters
+                            )
+                            path.pop()
+                        else:
+                            scalars.append(item)
+                    path.pop()
+                    if not scalars:
+                        continue
+                    value = scalars
+
+            # Value
+            adapter = self._resolve_shape(shape + (key,))
+            if adapter is None or adapter.batch is None:
+                continue
+            if adapters is None or adapter in adapters:
+                batches.add(adapter, (*path, key), value)
+
+    @staticmethod
+    def count_provided(
+        value: Any,
+        path: Sequence[str | int],
+        counter: Counter,
+        sign: int = 1,
+    ) -> None:
+        """
+        Count the keys without array indexes provided by a value.
+
+        Args:
+            value: Any - The value at the path.
+            path: Sequence[str | int] - The path of the value.
+            counter: Counter - The counter to update.
+            sign?: int - 1 to add the keys, -1 to subtract them.
+        Returns:
+            None
+        Raises:
+            None
+        """
+
+        def _count(node: Any, key: str) -> None:
+            if isinstance(node, dict):
+                for k, v in node.items():
+                    _count(v, f"{key}.{k}" if key else k)
+            elif isinstance(node, list):
+                scalars = False
+                for item in node:
+                    if isinstance(item, dict):
+                        _count(item, key)
+                    else:
+                        scalars = True
+                if scalars:
+                    counter[key] += sign
+            else:
+                counter[key] += sign
+
+        _count(value, ".".join(s for s in path if isinstance(s, str)))
+
+
+def _value_table(
+    value: Any, path: Sequence[str | int]
+) -> Tuple[Any, List[str | int]]:
+    """
+    Get the table to walk for a value and the path of the table, which
+    is the value itself for the document or a table in an array.
+    """
+    path = list(path)
+    if not path or isinstance(path[-1], int):
+        return value, path
+    return {path.pop(): value}, path
+
+
+def _merge_handlers(schema: TOMLSchema, handlers: Dict[str, Any]) -> dict:
+    """
+    Merge handlers into the flattened schema, like flattening the schema
+    and handlers together. The schema is only flattened again if the
+    handlers share keys with it, or would be ordered among its keys.
+    """
+    raw = schema.to_dict()
+    merged = dict(schema.items())
+    flat = flatten(handlers, method="schema")
+
+    # Flattening orders lists of handlers after every other key
+    last = next(reversed(merged.values()), None)
+    ordered = not isinstance(last, list) or all(
+        isinstance(h, list) and not any(isinstance(v, dict) for v in h)
+        for h in handlers.values()
+    )
+
+    if (
+        not ordered
+        or any(key in raw for key in handlers)
+        or any(key in merged for key in flat)
+    ):
+        return flatten({**raw, **handlers}, method="schema")
+
+    merged.update(flat)
+    return merged
+
+
+def _chain(hooks: Iterable[Callable | None]) -> Callable | None:
+    """Combine hooks into a single function, or None if there are none."""
+    if not (hooks := tuple(h for h in hooks if h is not None)):
+        return None
+    if len(hooks) == 1:
+        return hooks[0]
+
+    def _hook(*args: Any) -> None:
+        for hook in hooks:
+            hook(*args)
+
+    return _hook
+
+
+def _hook_adapter(
+    adapter: HandlerAdapter,
+    pattern: str,
+    on_handler: Callable[[str, str, float, Any], Any],
+) -> HandlerAdapter:
+    """
+    Wrap a call adapter to call a hook after each call. The adapter
+    has no key-free check, since the hook needs the key. Batches are
+    reported with the pattern as their key.
+    """
+    call, acall, batch = adapter.call, adapter.acall, adapter.batch
+
+    def _call(key: Any, value: Any) -> Any:
+        start = perf_counter()
+        result = call(key, value)
+        on_handler(format_key(key), pattern, perf_counter() - start, result)
+        return result
+
+    async def _acall(key: Any, value: Any) -> Any:
+        start = perf_counter()
+        result = await acall(key, value)
+        on_handler(format_key(key), pattern, perf_counter() - start, result)
+        return result
+
+    def _batch(values: Sequence[Any]) -> List[Tuple[int, Any]]:
+        start = perf_counter()
+        result = batch(values)
+        on_handler(pattern, pattern, perf_counter() - start, result)
+        return result
+
+    return HandlerAdapter(
+        adapter.handler,
+        adapter.kind,
+        _call,
+        None if acall is None else _acall,
+        adapter.expensive,
+        batch=None if batch is None else _batch,
+    )
+
+
+class _Batches:
+    """The values of the batch handlers found while walking a document."""
+
+    __slots__ = ("values",)
+
+    def __init__(self):
+        self.values: Dict[HandlerAdapter, Tuple[List[tuple], List[Any]]] = {}
+
+    def add(
+        self, adapter: HandlerAdapter, path: Sequence[str | int], value: Any
+    ) -> None:
+        """Add the value at a path to the batch of its handler."""
+        if (batch := self.values.get(adapter)) is None:
+            batch = self.values[adapter] = ([], [])
+        batch[0].append(tuple(path))
+        batch[1].append(value)
+
+    def run(self) -> Iterator[Tuple[str, Any]]:
+        """Run each batch handler, yielding the key and error of each error."""
+        for adapter, (paths, values) in self.values.items():
+            for idx, error in adapter.batch(values):
+                yield format_key(paths[idx]), error
@@ -0,0 +1,209 @@
+"""Module for profiling the handlers and phases of a validator."""
+
+import threading
+from typing import Any, Dict
+
+
+class TOMLProfilerEntry:
+    """The timings of a single handler pattern or phase."""
+
+    __slots__ = ("count", "total", "max", "errors")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.errors = 0
+
+    def to_dict(self) -> dict:
+        """Return the entry as a dictionary."""
+        return {
+            "count": self.count,
+            "total": self.total,
+            "mean": self.total / self.count if self.count else 0.0,
+            "max": self.max,
+            "errors": self.errors,
+        }
+
+
+class TOMLProfiler:
+    """
+    A collector of the call count, wall time and error count of each
+    handler pattern and validation phase, which is added to a validator
+    as a hook.
+    """
+
+    def __init__(self):
+        """
+        Initialize a new profiler.
+
+        Args:
+            None
+        Returns:
+            None
+        Raises:
+            None
+        """
+        self._handlers: Dict[str, TOMLProfilerEntry] = {}
+        self._phases: Dict[str, TOMLProfilerEntry] = {}
+        self._lock = threading.Lock()
+
+    def __repr__(self) -> str:
+        return f"<TOMLProfiler handlers={len(self._handlers)}>"
+
+    def __str__(self) -> str:
+        return self.report()
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _record(
+        entries: Dict[str, TOMLProfilerEntry],
+        name: str,
+        seconds: float,
+        failed: bool,
+    ) -> None:
+        """Add a single measurement to an entry."""
+        if (entry := entries.get(name)) is None:
+            entry = entries.setdefault(name, TOMLProfilerEntry())
+        entry.count += 1
+        entry.total += seconds
+        entry.errors += failed
+        entry.max = max(entry.max, seconds)
+
+    def record_handler(
+        self, pattern: str, seconds: float, failed: bool
+    ) -> None:
+        """
+        Record a single call of a handler.
+
+        Args:
+            pattern: str - The pattern of the handler.
+            seconds: float - The wall time of the call.
+            failed: bool - Whether the call returned an error.
+        Returns:
+            None
+        Raises:
+            None
+        """
+        with self._lock:
+            self._record(self._handlers, pattern, seconds, failed)
+
+    def record_phase(self, phase: str, seconds: float) -> None:
+        """
+        Record a single run of a validation phase.
+
+        Args:
+            phase: str - The name of the phase.
+            seconds: float - The wall time of the phase.
+        Returns:
+            None
+        Raises:
+            None
+        """
+        with self._lock:
+            self._record(self._phases, phase, seconds, False)
+
+    def on_handler(
+        self, key: str, pattern: str, duration: float, result: Any
+    ) -> None:
+        """
+        Record a handler call, as an 'on_handler' hook.
+
+        Args:
+            key: str - The key of the value.
+            pattern: str - The pattern of the handler.
+            duration: float - The wall time of the call.
+            result: Any - The result of the call.
+        Returns:
+            None
+        Raises:
+            None
+        """
+        self.record_handler(pattern, duration, bool(result))
+
+    def on_phase(self, phase: str, duration: float) -> None:
+        """
+        Record a validation phase, as an 'on_phase' hook.
+
+        Args:
+            phase: str - The name of the phase.
+            duration: float - The wall time of the phase.
+        Returns:
+            None
+        Raises:
+            None
+        """
+        self.record_phase(phase, duration)
+
+    def stats(self) -> dict:
+        """
+        Get the collected statistics.
+
+        Args:
+            None
+        Returns:
+            dict - The count, total, mean and max wall time in seconds,
+            and error count, of each handler pattern and phase.
+        Raises:
+            None
+        """
+        with self._lock:
+            return {
+                "handlers": {k: v.to_dict() for k, v in self._handlers.items()},
+                "phases": {k: v.to_dict() for k, v in self._phases.items()},
+            }
+
+    def report(self) -> str:
+        """
+        Format the collected statistics as a readable report, with the
+        phases first and the handlers by descending total time.
+
+        Args:
+            None
+        Returns:
+            str - The report.
+        Raises:
+            None
+        """
+
+        def _row(entry: dict, errors: bool) -> str:
+            row = (
+                f"count={entry['count']}"
+                f" total={entry['total'] * 1000:.3f}ms"
+                f" mean={entry['mean'] * 1000:.3f}ms"
+                f" max={entry['max'] * 1000:.3f}ms"
+            )
+            return f"{row} errors={entry['errors']}" if errors else row
+
+        stats = self.stats()
+        handlers = sorted(
+            stats["handlers"].items(), key=lambda kv: -kv[1]["total"]
+        )
+
+        rows = [f"[{k}] {_row(v, False)}" for k, v in stats["phases"].items()]
+        rows.extend(f"{k} = {_row(v, True)}" for k, v in handlers)
+
+        return "\n".join(rows)
+
+    def reset(self) -> None:
+        """
+        Remove the collected statistics.
+
+        Args:
+            None
+        Returns:
+            None
+        Raises:
+            None
+        """
+        with self._lock:
+            self._handlers.clear()
+            self._phases.clear()
@@ -1,35 +1,213 @@
 """A module for defining a TOML schema structure."""
 
-import fnmatch
 import re
-from typing import Any, List, Tuple
+from functools import partial
+from typing import Any, Collection, Dict, Iterable, Iterator, List, Set, Tuple
 
 from tomlval.errors import TOMLSchemaError
 from tomlval.utils import (
+    KeyMatcher,
     flatten,
     is_handler,
     key_pattern,
-    nested_array_pattern,
     stringify_schema,
 )
 
+_absent = object()
+
+# An index segment, one followed by a key (or the end of the key of a
+# table), and the indexes ending a key
+_index_pattern = re.compile(r"\.\[\d+](?=\.|$)")
+_table_pattern = re.compile(r"\.\[\d+](?=$|\.(?!\[\d+](?:\.|$)))")
+_trailing_pattern = re.compile(r"(?:\.\[\d+])+$")
+
+
+class _ArrayKeys:
+    """The required keys of the elements of an array of tables."""
+
+    __slots__ = ("required", "arrays", "names")
+
+    def __init__(self):
+        self.required: List[Tuple[Tuple[str, ...], str]] = []
+        self.arrays: Dict[Tuple[str, ...], "_ArrayKeys"] = {}
+        self.names: List[str] = []
+
+
+def _lookup(node: Any, segments: Tuple[str, ...]) -> Any:
+    """Get the value at the segments of a table, if there is one."""
+    for segment in segments:
+        if not isinstance(node, dict):
+            return _absent
+        node = node.get(segment, _absent)
+    return node
+
+
+def _provides(value: Any) -> bool:
+    """Check if a value provides its key, like a value or scalar array."""
+    if isinstance(value, list):
+        return any(not isinstance(v, dict) for v in value)
+    return value is not _absent and not isinstance(value, dict)
+
+
+def _iter_missing_elements(
+    node: Any, arrays: Dict[Tuple[str, ...], _ArrayKeys], prefix: str
+) -> Iterator[str]:
+    """
+    Yield the required keys missing from each element of the arrays of
+    tables in a table, with the index of the element.
+    """
+    for segments, array_keys in arrays.items():
+        array = _lookup(node, segments)
+        key = prefix + ".".join(segments)
+
+        found = False
+        if isinstance(array, list):
+            for idx, element in enumerate(array):
+                if not isinstance(element, dict):
+                    continue
+                found = True
+                for _segments, name in array_keys.required:
+                    if not _provides(_lookup(element, _segments)):
+                        yield f"{key}.[{idx}].{name}"
+                if array_keys.arrays:
+                    yield from _iter_missing_elements(
+                        element, array_keys.arrays, f"{key}.[{idx}]."
+                    )
+
+        # Without any tables, the keys are missing from the array itself
+        if not found:
+            for name in array_keys.names:
+                yield f"{key}[].{name}"
+
+
+def _index_flat_keys(
+    dictionary: dict, arrays: bool
+) -> Tuple[Set[str], Dict[str, List[int]], Set[str]]:
+    """
+    Index the keys of a flattened dictionary, getting the keys without
+    array indexes and, if arrays is set, the indexes of the tables of
+    each array along with the keys provided by the scalars of an array.
+    """
+    # Only keys in arrays have indexes to remove
+    indexed = [k for k in dictionary if "[" in k]
+    provided_keys = {k for k in dictionary if "[" not in k}
+    provided_keys.update(map(partial(_index_pattern.sub, ""), indexed))
+    if not arrays:
+        return provided_keys, {}, set()
+
+    # Keys ending with indexes are values of arrays, or tables in them
+    parents = {k.rpartition(".")[0] for k in indexed if k[-1] != "]"}
+    elements = set()
+    listed = set()
+    for key in indexed:
+        if key[-1] != "]":
+            continue
+        if (match := _trailing_pattern.search(key)) is None:
+            parents.add(key.rpartition(".")[0])
+            continue
+        stem = key[: match.start()]
+        if isinstance(dictionary[key], dict) and match.group().count("[") == 1:
+            elements.add(key)
+        else:
+            listed.add(stem)
+        parents.add(stem.rpartition(".")[0])
+
+    # The tables a key is in, found once for all keys of the same table
+    for parent in parents:
+        for match in _table_pattern.finditer(parent):
+            elements.add(parent[: match.end()])
+
+    tables: Dict[str, List[int]] = {}
+    for element in elements:
+        array, _, idx = element.rpartition(".[")
+        tables.setdefault(array, []).append(int(idx[:-1]))
+
+    return provided_keys, tables, listed
+
+
+def _missing_tables(
+    dictionary: dict,
+    tables: Dict[str, List[int]],
+    listed: Set[str],
+    arrays: Dict[Tuple[str, ...], _ArrayKeys],
+    prefix: str,
+) -> List[str]:
+    """
+    Get the required keys missing from each element of the arrays of
+    tables in a flattened dictionary, like '_iter_missing_elements'.
+    """
+    missing = []
+    for segments, array_keys in arrays.items():
+        key = prefix + ".".join(segments)
+
+        # Without any tables, the keys are missing from the array itself
+        if (indexes := tables.get(key)) is None:
+            missing.extend(f"{key}[].{name}" for name in array_keys.names)
+            continue
+
+        for idx in sorted(indexes):
+            element = f"{key}.[{idx}]."
+            for _, name in array_keys.required:
+                _key = element + name
+                if _key not in listed and not _provides(
+                    dictionary.get(_key, _absent)
+                ):
+                    missing.append(_key)
+            if array_keys.arrays:
+                missing.extend(
+                    _missing_tables(
+                        dictionary, tables, listed, array_keys.arrays, element
+                    )
+                )
+
+    return missing
+
 
 class TOMLSchema:
     """A class for defining and validating a TOML schema."""
 
-    def __init__(self, schema: dict):
+    def __init__(self, schema: dict, lazy: bool = False):
+        """
+        Initialize a new schema.
+
+        Args:
+            schema: dict - The schema.
+            lazy?: bool - Whether to flatten and validate the schema
+            on first use, instead of immediately.
+        Returns:
+            None
+        Raises:
+            TOMLSchemaError - If the schema is invalid and not lazy.
+            TOMLSchemaMergeError - If the schema cannot be merged
+            and is not lazy.
+        """
         self._raw_schema = schema
-        self._schema = flatten(self._raw_schema, method="schema")
+        self._schema: dict | None = None
         self._keys = {}
-        self._validate_schema(self._schema)
+
+        # Key index, set when the schema is built
+        self._required_keys: frozenset = frozenset()
+        self._optional_keys: frozenset = frozenset()
+        self._missing_names: Dict[str, str] = {}
+        self._array_names: Dict[str, str] = {}
+        self._array_keys = _ArrayKeys()
+        self._wildcard_keys: Tuple[str, ...] = ()
+        self._wildcard_matcher: KeyMatcher | None = None
+
+        if not lazy:
+            self._build()
 
     def __str__(self) -> str:
+        self._build()
         return stringify_schema(self._schema)
 
     def __repr__(self) -> str:
+        if self._schema is None:
+            return "<TOMLSchema lazy>"
         return f"<TOMLSchema keys={len(self)}>"
 
     def __len__(self) -> int:
+        self._build()
         return len(self._schema)
 
     def __eq__(self, other: Any) -> bool:
@@ -44,15 +222,46 @@ class TOMLSchema:
         return hash(str(self))
 
     def __contains__(self, key: str) -> bool:
+        self._build()
         return key in self._schema or key in self._keys
 
     def __getitem__(self, key: str) -> Any:
+        self._build()
         if key in self._schema:
             return self._schema[key]
         if key in self._keys:
             return self._schema[self._keys[key]]
         raise KeyError(f"Key '{key}' not found in schema.")
 
+    def _build(self) -> None:
+        """Flatten, validate and index the schema, if it is not yet."""
+        if self._schema is not None:
+            return
+
+        # Failures leave the schema unbuilt, so every use raises them
+        self._schema = flatten(self._raw_schema, method="schema")
+        self._keys = {}
+        try:
+            self._validate_schema(self._schema)
+        except TOMLSchemaError:
+            self._schema = None
+            raise
+        self._index_keys()
+
+    def validate_schema(self) -> None:
+        """
+        Flatten and validate a lazy schema now, instead of on first use.
+
+        Args:
+            None
+        Returns:
+            None
+        Raises:
+            TOMLSchemaError - If the schema is invalid.
+            TOMLSchemaMergeError - If the schema cannot be merged.
+        """
+        self._build()
+
     def _validate_schema(self, schema: dict) -> None:
         if not isinstance(schema, dict):
             raise TOMLSchemaError("Schema must be a dictionary.")
@@ -79,7 +288,7 @@ class TOMLSchema:
             if isinstance(v, (tuple, list)):
                 invalid_indexes = []
                 for i, h in enumerate(v):
-                    if is_handler(h, k):
+                    if not isinstance(h, re.Pattern) and is_handler(h, k):
                         invalid_indexes.append(i)
                 if invalid_indexes:
                     invalid_indexes = ", ".join(map(str, invalid_indexes))
@@ -93,7 +302,7 @@ class TOMLSchema:
                     )
 
             ## Regex pattern
-            if isinstance(v, re.Pattern):
+            elif isinstance(v, re.Pattern):
                 pass
 
             ## Simple type
@@ -108,6 +317,66 @@ class TOMLSchema:
 
         return None
 
+    def _index_keys(self) -> None:
+        """
+        Index the required, optional and wildcard keys of the schema.
+
+        Keys with a '?' in any segment are optional, including keys with
+        wildcards. The required keys are stored without array markers,
+        along with the name they are reported as when missing, and the
+        required keys in arrays of tables are also indexed by array.
+        """
+        required_keys = {}
+        optional_keys = set()
+        wildcard_keys = []
+        array_keys = _ArrayKeys()
+
+        for key in self._schema:
+            if "?" in key:
+                if "*" not in key:
+                    optional_keys.add(key)
+            elif "*" in key:
+                wildcard_keys.append(key.replace("[]", ""))
+            else:
+                required_keys[key.replace("[]", "")] = key
+
+                # Arrays of tables
+                parts = key.split("[].")
+                node = array_keys
+                for i, part in enumerate(parts[:-1]):
+                    node = node.arrays.setdefault(
+                        tuple(part.split(".")), _ArrayKeys()
+                    )
+                    node.names.append("[].".join(parts[i + 1 :]))
+                if node is not array_keys:
+                    node.required.append(
+                        (tuple(parts[-1].split(".")), parts[-1])
+                    )
+
+        self._required_keys = frozenset(required_keys)
+        self._optional_keys = frozenset(optional_keys)
+        self._missing_names = {
+            k: v for k, v in required_keys.items() if "[]" not in v
+        }
+        self._array_names = {
+            k: v for k, v in required_keys.items() if "[]" in v
+        }
+        self._array_keys = array_keys
+        self._wildcard_keys = tuple(wildcard_keys)
+        self._wildcard_matcher = KeyMatcher(wildcard_keys)
+
+    @property
+    def required_keys(self) -> frozenset:
+        """The keys without wildcards that must be present in the data."""
+        self._build()
+        return self._required_keys
+
+    @property
+    def optional_keys(self) -> frozenset:
+        """The keys without wildcards that are marked as optional."""
+        self._build()
+        return self._optional_keys
+
     def get(self, key: str, default: Any = None) -> Any:
         """
         Get a value from the schema.
@@ -121,6 +390,7 @@ class TOMLSchema:
         Raises:
             None
         """
+        self._build()
 
         if key in self._schema:
             return self._schema[key]
@@ -141,6 +411,7 @@ class TOMLSchema:
         Raises:
             None
         """
+        self._build()
         return list(self._schema.keys())
 
     def values(self) -> List[Any]:
@@ -154,6 +425,7 @@ class TOMLSchema:
         Raises:
             None
         """
+        self._build()
         return list(self._schema.values())
 
     def items(self) -> List[Tuple[str, Any]]:
@@ -167,6 +439,7 @@ class TOMLSchema:
         Raises:
             None
         """
+        self._build()
         return list(self._schema.items())
 
     def to_dict(self) -> dict:
@@ -189,59 +462,87 @@ class TOMLSchema:
         If a key with a wildcard is present, it will cause
         the key to be considered as present if any key matches.
 
-        Currently, nested arrays also consider the key as present
-        for any match. This does not make sure ALL sub-arrays
-        include the key.
+        Required keys in arrays of tables are checked for each
+        table in the array, and reported with its index.
 
         Args:
-            dictionary: dict - The dictionary to compare.
+            dictionary: dict - The flattened dictionary to compare.
         Returns:
             list[str] - The keys that are missing in the dictionary.
         Raises:
             None
         """
+        self._build()
 
-        # TODO:
-        # - Implement a more thorough comparison.
-        #   At the moment, this method only checks for existence.
-        #   So it does not check if all nested keys are valid,
-        #   only a single one.
-        # - Better optional checking
-        #   There are some edge cases that can occur when only
-        #   checking for the existence of a ?-character.
-
-        provided_keys = set(
-            re.sub(nested_array_pattern, ".", k) for k in dictionary
+        arrays = self._array_keys.arrays
+        provided_keys, tables, listed = _index_flat_keys(
+            dictionary, bool(arrays)
         )
 
-        # Remove characters and map keys
-        required_keys = set()
-        nested_arrays = {}
-
-        for key in self.keys():
-            if "*" not in key and "?" not in key:
-                _key = key.replace("[]", "")
-                if "[]" in key:
-                    nested_arrays[_key] = key
-                required_keys.add(_key)
-
-        # Wildcard keys
-        for key in self.keys():
-            if "*" in key:
-                pattern = key.replace("[]", "")
-                if not any(
-                    fnmatch.fnmatch(provided_key, pattern)
-                    for provided_key in provided_keys
-                ):
-                    required_keys.add(pattern)
+        return self._missing_keys(
+            provided_keys,
+            _missing_tables(dictionary, tables, listed, arrays, ""),
+        )
+
+    def missing_keys(
+        self, provided_keys: Collection[str], data: dict | None = None
+    ) -> list[str]:
+        """
+        Get the keys in the schema that are missing from a set of keys.
 
-        # Re-substitute keys
-        for k, v in nested_arrays.items():
-            if k in required_keys:
-                required_keys.remove(k)
-                required_keys.add(v)
+        The provided keys must not contain any array indexes,
+        meaning 'arr.[0].key' must be provided as 'arr.key'.
 
-        return list(required_keys - provided_keys)
+        If the data is given, required keys in arrays of tables are
+        checked for each table in a single pass over the arrays, and
+        reported with its index (e.g. 'arr.[3].key'). If an array has
+        no tables, they are reported for the array (e.g. 'arr[].key').
+        Otherwise, they are present if any table in the array has them.
+
+        Args:
+            provided_keys: Collection[str] - The keys present in the data.
+            data?: dict | None - The data the keys were provided by.
+        Returns:
+            list[str] - The keys that are missing.
+        Raises:
+            None
+        """
+        self._build()
+
+        # Arrays of tables
+        if data is None:
+            elements = (
+                v
+                for k, v in self._array_names.items()
+                if k not in provided_keys
+            )
+        else:
+            elements = _iter_missing_elements(data, self._array_keys.arrays, "")
+
+        return self._missing_keys(provided_keys, elements)
+
+    def _missing_keys(
+        self, provided_keys: Collection[str], elements: Iterable[str]
+    ) -> list[str]:
+        """
+        Get the missing keys, followed by the given missing keys of arrays
+        of tables and the wildcard keys that no provided key matches.
+        """
+        missing = [
+            v for k, v in self._missing_names.items() if k not in provided_keys
+        ]
+        missing.extend(elements)
+
+        # Wildcard keys are present if any provided key matches them
+        if self._wildcard_keys:
+            pending = set(self._wildcard_keys)
+            for key in provided_keys:
+                pending.difference_update(self._wildcard_matcher.match_all(key))
+                if not pending:
+                    break
+            missing.extend(k for k in self._wildcard_keys if k in pending)
+
+        return missing
 
 
 if __name__ == "__main__":
@@ -0,0 +1,106 @@
+"""Module for caching compiled TOML schemas on disk."""
+
+import os
+import pathlib
+import pickle
+from importlib import metadata
+
+from tomlval.toml_schema import TOMLSchema
+from tomlval.types import PathOrStr
+from tomlval.utils import fingerprint, to_path
+
+_CACHE_VERSION = 1
+
+
+def _tomlval_version() -> str:
+    """Get the installed version of tomlval."""
+    try:
+        return metadata.version("tomlval")
+    except metadata.PackageNotFoundError:
+        return "unknown"
+
+
+class TOMLSchemaCache:
+    """
+    A directory of compiled schemas, shared between processes.
+
+    Each schema is stored in its own file, keyed by the fingerprint of
+    the schema and the version of tomlval, so a short-lived process can
+    load a compiled schema instead of flattening and validating it.
+    Handlers are stored by their import path, meaning schemas with
+    lambdas or local functions are compiled as usual, but not stored.
+    """
+
+    def __init__(self, path: PathOrStr):
+        """
+        Initialize a new schema cache.
+
+        Args:
+            path: PathOrStr - The directory to store the schemas in.
+        Returns:
+            None
+        Raises:
+            TypeError - If the path is not a string or pathlib.Path object.
+        """
+        self._path = to_path(path)
+        self._version = _tomlval_version()
+
+    def __repr__(self) -> str:
+        return f"<TOMLSchemaCache path={str(self._path)!r}>"
+
+    def _file(self, schema: dict) -> pathlib.Path:
+        """Get the file of a schema."""
+        key = fingerprint((_CACHE_VERSION, self._version, schema))
+        return self._path / f"{key}.schema"
+
+    def load(self, schema: dict) -> TOMLSchema:
+        """
+        Load a compiled schema, compiling and storing it if it is not
+        in the cache.
+
+        Args:
+            schema: dict - The schema to compile.
+        Returns:
+            TOMLSchema - The compiled schema.
+        Raises:
+            TOMLSchemaError - If the schema is invalid.
+            OSError - If the schema cannot be written.
+        """
+        path = self._file(schema)
+
+        if path.is_file():
+            try:
+                with path.open("rb") as file:
+                    compiled = pickle.load(file)
+                if isinstance(compiled, TOMLSchema):
+                    return compiled
+            except Exception:
+                pass
+
+        compiled = TOMLSchema(schema)
+
+        try:
+            data = pickle.dumps(compiled)
+        except (pickle.PicklingError, AttributeError, TypeError):
+            return compiled
+
+        self._path.mkdir(parents=True, exist_ok=True)
+        temp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        temp_path.write_bytes(data)
+        temp_path.replace(path)
+
+        return compiled
+
+    def clear(self) -> None:
+        """
+        Remove all schemas from the cache.
+
+        Args:
+            None
+        Returns:
+            None
+        Raises:
+            OSError - If a schema cannot be removed.
+        """
+        for path in self._path.glob("*.schema"):
+            path.unlink()
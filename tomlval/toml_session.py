@@ -0,0 +1,312 @@
+"""Module for incrementally re-validating a changing TOML document."""
+
+import copy
+from collections import Counter
+from typing import Any, Dict, Sequence, Set, Tuple
+
+from tomlval.toml_plan import TOMLPlan
+from tomlval.utils import FlatPath, HandlerAdapter, format_key
+
+Path = Tuple[str | int, ...]
+
+
+def _has_array_tables(value: Any) -> bool:
+    """Check if a value is or contains an array with a table."""
+    if isinstance(value, dict):
+        return any(_has_array_tables(v) for v in value.values())
+    if isinstance(value, list):
+        return any(isinstance(v, dict) or _has_array_tables(v) for v in value)
+    return False
+
+
+def _has(node: Any, segment: str | int) -> bool:
+    """Check if a table or array has a key or index."""
+    if isinstance(segment, int):
+        return isinstance(node, list) and 0 <= segment < len(node)
+    return isinstance(node, dict) and segment in node
+
+
+class TOMLSession:
+    """
+    A document that is re-validated incrementally as it changes.
+
+    The session validates the document once, then keeps its errors
+    current as values are set or removed. Only the handlers of the
+    changed values are run again, except for batch handlers, which run
+    again with every value they match when one of them changes. The
+    missing keys are only re-evaluated when a change adds or removes
+    the last occurrence of a key, or changes an array of tables. The
+    document is updated in place.
+    """
+
+    def __init__(self, plan: TOMLPlan, data: dict):
+        """
+        Initialize a new session and validate the document.
+
+        Args:
+            plan: TOMLPlan - The validation plan.
+            data: dict - The TOML data to validate.
+        Returns:
+            None
+        Raises:
+            TypeError - If data is not a dictionary.
+            TOMLHandlerError - If any of the handlers are invalid.
+        """
+        if not isinstance(data, dict):
+            raise TypeError("Data must be a dictionary.")
+
+        self._plan = plan
+        self._data = data
+        found: Set[HandlerAdapter] = set()
+        self._errors: Dict[str, Any] = dict(
+            plan.iter_value_errors(data, (), found)
+        )
+        self._batch_errors = plan.batch_errors(data, found)
+        self._provided: Counter = Counter()
+        plan.count_provided(data, (), self._provided)
+        self._missing_keys = set(plan.schema.missing_keys(self._provided, data))
+        self._missing: Dict[str, Any] = dict(
+            plan.iter_missing_errors(self._missing_keys)
+        )
+
+    def __repr__(self) -> str:
+        return f"<TOMLSession errors={len(self.errors)}>"
+
+    @property
+    def data(self) -> dict:
+        """The current document."""
+        return self._data
+
+    @property
+    def errors(self) -> dict:
+        """The current errors of the document."""
+        errors = dict(self._errors)
+        for batch_errors in self._batch_errors.values():
+            errors.update(batch_errors)
+        errors.update(self._missing)
+        return errors
+
+    def is_valid(self) -> bool:
+        """
+        Checks if the current document has no errors.
+
+        Args:
+            None
+        Returns:
+            bool - True if the document has no errors, False otherwise.
+        Raises:
+            None
+        """
+        return (
+            not self._errors
+            and not any(self._batch_errors.values())
+            and not self._missing
+        )
+
+    def update(self, changes: dict) -> dict:
+        """
+        Merge changes into the document and re-validate them.
+
+        Tables are merged recursively, while any other value
+        replaces the value at its key.
+
+        Args:
+            changes: dict - The changed subtree of the document.
+        Returns:
+            dict - The current errors of the document.
+        Raises:
+            TypeError - If changes is not a dictionary.
+            TOMLHandlerError - If any of the handlers are invalid.
+        """
+        if not isinstance(changes, dict):
+            raise TypeError("Changes must be a dictionary.")
+
+        touched = False
+        found: Set[HandlerAdapter] = set()
+
+        def _merge(node: dict, changed: dict, path: Path) -> None:
+            nonlocal touched
+            for k, v in changed.items():
+                if isinstance(v, dict) and isinstance(node.get(k), dict):
+                    _merge(node[k], v, path + (k,))
+                elif self._apply(path + (k,), v, False, found):
+                    touched = True
+
+        _merge(self._data, changes, ())
+        self._refresh_batches(found)
+        self._refresh_missing(touched)
+
+        return self.errors
+
+    def set(self, key: str | Sequence[str | int], value: Any) -> dict:
+        """
+        Set a value of the document and re-validate it.
+
+        Args:
+            key: str | Sequence[str | int] - The flattened key of
+            the value (e.g. 'arr.[0].name') or its path.
+            value: Any - The new value.
+        Returns:
+            dict - The current errors of the document.
+        Raises:
+            KeyError - If the parent of the key does not exist.
+            TOMLHandlerError - If any of the handlers are invalid.
+        """
+        found: Set[HandlerAdapter] = set()
+        changed = self._apply(FlatPath.parse(key), value, False, found)
+        self._refresh_batches(found)
+        self._refresh_missing(changed)
+        return self.errors
+
+    def remove(self, key: str | Sequence[str | int]) -> dict:
+        """
+        Remove a value from the document and re-validate it.
+
+        Args:
+            key: str | Sequence[str | int] - The flattened key of
+            the value (e.g. 'arr.[0].name') or its path.
+        Returns:
+            dict - The current errors of the document.
+        Raises:
+            KeyError - If the key does not exist.
+            TOMLHandlerError - If any of the handlers are invalid.
+        """
+        found: Set[HandlerAdapter] = set()
+        changed = self._apply(FlatPath.parse(key), None, True, found)
+        self._refresh_batches(found)
+        self._refresh_missing(changed)
+        return self.errors
+
+    def _apply(
+        self, path: Path, value: Any, remove: bool, found: Set[HandlerAdapter]
+    ) -> bool:
+        """
+        Apply a change at a path, re-running the handlers below it,
+        except for batch handlers, which are added to found.
+
+        Returns whether the missing keys may have changed, meaning the
+        presence of a key changed or an array of tables was changed.
+        """
+        if not path:
+            raise KeyError("Key must not be empty.")
+
+        # Parent
+        parent: Any = self._data
+        for i, segment in enumerate(path[:-1]):
+            if (
+                not remove
+                and isinstance(parent, dict)
+                and isinstance(segment, str)
+                and isinstance(path[i + 1], str)
+            ):
+                # Create missing tables
+                parent = parent.setdefault(segment, {})
+            elif _has(parent, segment):
+                parent = parent[segment]
+            else:
+                raise KeyError(format_key(path))
+
+        last = path[-1]
+        exists = _has(parent, last)
+        if not exists and (
+            remove or isinstance(last, int) or not isinstance(parent, dict)
+        ):
+            raise KeyError(format_key(path))
+        old = parent[last] if exists else None
+
+        # Scalar array values are validated together, so changing an
+        # element that is not a table, or is inside a nested array,
+        # re-validates the outermost array.
+        target = path
+        for i, segment in enumerate(path):
+            if not isinstance(segment, int):
+                continue
+            nested = i + 1 < len(path) and isinstance(path[i + 1], int)
+            scalar = i + 1 == len(path) and (
+                remove
+                or not isinstance(old, dict)
+                or not isinstance(value, dict)
+            )
+            if nested or scalar:
+                target = path[:i]
+                while isinstance(target[-1], int):
+                    target = target[:-1]
+                old = copy.deepcopy(self._get(target))
+                exists = True
+                break
+
+        before = Counter()
+        if exists:
+            self._plan.count_provided(old, target, before)
+            found.update(self._plan.batch_adapters(old, target))
+
+        # Data
+        if remove:
+            del parent[last]
+        else:
+            parent[last] = value
+
+        # Errors
+        prefix = format_key(target)
+        self._errors = {
+            k: v
+            for k, v in self._errors.items()
+            if k != prefix and not k.startswith(f"{prefix}.")
+        }
+
+        arrays = (
+            any(isinstance(s, int) for s in path)
+            or _has_array_tables(old)
+            or _has_array_tables(value)
+        )
+
+        after = Counter()
+        if not remove or target is not path:
+            value = self._get(target)
+            self._errors.update(
+                self._plan.iter_value_errors(value, target, found)
+            )
+            self._plan.count_provided(value, target, after)
+
+        # Provided keys
+        changed = arrays
+        for k in before.keys() | after.keys():
+            count = self._provided[k] + after[k] - before[k]
+            if (count > 0) != (self._provided[k] > 0):
+                changed = True
+            if count > 0:
+                self._provided[k] = count
+            else:
+                del self._provided[k]
+
+        return changed
+
+    def _get(self, path: Path) -> Any:
+        """Get the value at a path of the document."""
+        node: Any = self._data
+        for segment in path:
+            node = node[segment]
+        return node
+
+    def _refresh_batches(self, found: Set[HandlerAdapter]) -> None:
+        """Re-run the batch handlers of changed values with every value."""
+        if found:
+            self._batch_errors.update(
+                self._plan.batch_errors(self._data, found)
+            )
+
+    def _refresh_missing(self, changed: bool) -> None:
+        """Re-evaluate the missing keys if they may have changed."""
+        if not changed:
+            return
+
+        missing_keys = set(
+            self._plan.schema.missing_keys(self._provided, self._data)
+        )
+        self._missing = {
+            k: v for k, v in self._missing.items() if k in missing_keys
+        }
+        self._missing.update(
+            self._plan.iter_missing_errors(missing_keys - self._missing_keys)
+        )
+        self._missing_keys = missing_keys
@@ -2,22 +2,78 @@
 
 # pylint: disable=C0103, R0911
 
+import copy
+import hashlib
 import inspect
+import itertools
+import pathlib
 import re
-from typing import Any, Callable, Tuple, Union
+import tomllib
+from concurrent.futures import Executor
+from typing import Any, Callable, Iterable, Iterator, List, Tuple, Union
 
 from tomlval.errors import TOMLHandlerError
+from tomlval.toml_file_cache import TOMLFileCache, TOMLFileCacheEntry
+from tomlval.toml_plan import TOMLHook, TOMLPlan
+from tomlval.toml_profiler import TOMLProfiler
 from tomlval.toml_schema import TOMLSchema
-from tomlval.types import Handler
+from tomlval.toml_session import TOMLSession
+from tomlval.types import Handler, PathOrStr
 from tomlval.utils import (
+    LRUCache,
     dict_key_pattern,
-    flatten,
     is_handler,
+    pool_map,
     stringify_schema,
+    to_path,
 )
+from tomlval.utils.pool import ExecutorType
 
 TypeList = Union[type, Tuple[type, ...]]
 
+_worker_validator: Union["TOMLValidator", None] = None
+
+
+def _init_worker(validator: "TOMLValidator") -> None:
+    """Set the validator used by a worker process."""
+    global _worker_validator  # pylint: disable=W0603
+
+    # Thread pools do not survive a fork, so handlers run inline
+    if validator._parallel_handlers is not None:
+        validator = copy.copy(validator)
+        validator._parallel_handlers = None
+        validator._plan = None
+
+    _worker_validator = validator
+
+
+def _validate_in_worker(data: dict) -> dict:
+    """Validate a document with the validator of a worker process."""
+    return _worker_validator.validate(data)
+
+
+def _validate_file(
+    validator: "TOMLValidator", path: pathlib.Path, digest: str | None
+) -> Tuple[str, dict | None]:
+    """
+    Parse and validate a file, unless its content hash matches a digest.
+
+    Returns the content hash of the file and its errors, or None as
+    errors if the content hash matches the digest.
+    """
+    content = path.read_bytes()
+    _digest = hashlib.sha256(content).hexdigest()
+
+    if _digest == digest:
+        return _digest, None
+
+    return _digest, validator.validate(tomllib.loads(content.decode()))
+
+
+def _validate_file_in_worker(job: Tuple[pathlib.Path, str | None]) -> Any:
+    """Validate a file with the validator of a worker process."""
+    return _validate_file(_worker_validator, *job)
+
 
 class TOMLValidator:
     """A class for creating a TOML validator."""
@@ -33,6 +89,13 @@ class TOMLValidator:
         on_pattern_mismatch: Callable[
             [str, Any, re.Pattern], Any
         ] = lambda key, value, pattern: "pattern-mismatch",
+        segment_wildcards: bool = False,
+        parallel_handlers: Executor | None = None,
+        memoize: bool = False,
+        memo_size: int = 4096,
+        memoize_subtrees: bool = False,
+        profile: bool = False,
+        codegen: bool = False,
     ):
         """
         Initialize a new TOML validator.
@@ -50,10 +113,29 @@ class TOMLValidator:
             on_pattern_mismatch?: Callable[[str, Any, re.Pattern], Any] - A
             callback function that runs when a key has a value that does not match the
             regex pattern in the schema.
+            segment_wildcards?: bool - Whether a wildcard in a handler key
+            only matches a single dotted segment, instead of any number
+            of segments.
+            parallel_handlers?: Executor | None - An executor, such as a
+            ThreadPoolExecutor, that runs the handlers marked with
+            'tomlval.expensive' while the other handlers run inline.
+            memoize?: bool - Whether to cache the results of every
+            function handler and regex pattern, instead of only the
+            handlers marked with 'tomlval.pure'.
+            memo_size?: int - The maximum number of cached results.
+            memoize_subtrees?: bool - Whether to cache the errors of
+            tables and reuse them for identical tables with the same
+            shape, assuming that every handler is pure.
+            profile?: bool - Whether to record the call count, wall time
+            and error count of each handler and validation phase.
+            codegen?: bool - Whether to generate a Python function that
+            walks the known keys of the handlers, with their checks
+            written out, instead of matching each key.
         Returns:
             None
         Raises:
             TypeError - If the schema- or handlers dictionary are invalid.
+            ValueError - If memo_size is less than 1.
             TOMLHandlerError - If any of the handlers are invalid.
         """
         # Schema
@@ -115,49 +197,74 @@ class TOMLValidator:
                 )
             )
 
-        self._schema = schema or TOMLSchema({})
+        self._schema = TOMLSchema({}) if schema is None else schema
         self._handlers = handlers or {}
         self._on_missing = on_missing
         self._on_type_mismatch = on_type_mismatch
         self._on_pattern_mismatch = on_pattern_mismatch
+        self._segment_wildcards = segment_wildcards
+        self._parallel_handlers = parallel_handlers
+        self._memoize = memoize
+        self._memo = LRUCache(memo_size)
+        self._memoize_subtrees = memoize_subtrees
+        self._codegen = codegen
+        self._hooks: List[TOMLHook] = []
+        self._profiler = None
+        if profile:
+            self._profiler = TOMLProfiler()
+            self.add_hook(
+                on_phase=self._profiler.on_phase,
+                on_handler=self._profiler.on_handler,
+            )
+        self._plan: TOMLPlan | None = None
 
     def __str__(self) -> str:
         return stringify_schema(self.handlers)
 
     def _map_handlers(self, data: dict) -> dict[str, Handler | None]:
         """A method to map each key to a handler."""
-
-        _handlers = flatten(self.handlers, method="schema")
+        plan = self.compile()
+        _handlers = plan.handlers
 
         def _match_key(key: str) -> Handler | None:
             """The method that finds the most appropriate handler for a key."""
+            pattern = plan.match(key)
+            return None if pattern is None else _handlers[pattern]
 
-            key = re.sub(r"\.\[\d+]\.", "[].", key)
-
-            if key in _handlers:
-                return _handlers[key]
-
-            best_specificity = -1
-            best_wildcard_count = float("inf")
-            matched_handler: Handler | None = None
+        return {k: _match_key(k) for k in data}
 
-            for pattern, handler in _handlers.items():
-                if "*" in pattern:
-                    regex = "^" + re.escape(pattern).replace("\\*", ".*") + "$"
-                    if re.fullmatch(regex, key):
-                        specificity = len(pattern.replace("*", ""))
-                        wildcard_count = pattern.count("*")
-                        if specificity > best_specificity or (
-                            specificity == best_specificity
-                            and wildcard_count < best_wildcard_count
-                        ):
-                            best_specificity = specificity
-                            best_wildcard_count = wildcard_count
-                            matched_handler = handler
+    def compile(self) -> TOMLPlan:
+        """
+        Compile the schema and handlers into a validation plan.
 
-            return matched_handler
+        The plan is cached and reused by every validation until
+        a new handler is added.
 
-        return {k: _match_key(k) for k in data}
+        Args:
+            None
+        Returns:
+            TOMLPlan - The compiled validation plan.
+        Raises:
+            TOMLSchemaError - If the schema is invalid.
+            TOMLSchemaMergeError - If the handlers cannot be merged.
+            TOMLHandlerError - If a handler has invalid parameters.
+        """
+        if self._plan is None:
+            self._plan = TOMLPlan(
+                self._schema,
+                self._handlers,
+                on_missing=self._on_missing,
+                on_type_mismatch=self._on_type_mismatch,
+                on_pattern_mismatch=self._on_pattern_mismatch,
+                segment_wildcards=self._segment_wildcards,
+                executor=self._parallel_handlers,
+                memo=self._memo,
+                memoize=self._memoize,
+                memoize_subtrees=self._memoize_subtrees,
+                codegen=self._codegen,
+                hooks=tuple(self._hooks),
+            )
+        return self._plan
 
     def add_handler(self, key: str, fn: Handler) -> None:
         """
@@ -180,17 +287,97 @@ class TOMLValidator:
             raise TOMLHandlerError(error)
 
         self._handlers[key] = fn
+        self._plan = None
+
+    def add_hook(
+        self,
+        on_phase: Callable[[str, float], Any] | None = None,
+        on_handler: Callable[[str, str, float, Any], Any] | None = None,
+    ) -> None:
+        """
+        Add hooks that are called after each phase of validation, and
+        after each handler call.
+
+        Args:
+            on_phase?: Callable[[str, float], Any] | None - A function
+            called with the name and duration in seconds of a phase.
+            on_handler?: Callable[[str, str, float, Any], Any] | None - A
+            function called with the key, the handler pattern, the
+            duration in seconds and the result of a handler call.
+        Returns:
+            None
+        Raises:
+            TypeError - If no hook is given, or a hook is not callable.
+        """
+        if on_phase is None and on_handler is None:
+            raise TypeError("At least one hook must be given.")
+
+        for name, hook in (("on_phase", on_phase), ("on_handler", on_handler)):
+            if hook is not None and not callable(hook):
+                raise TypeError(f"{name} must be callable.")
+
+        self._hooks.append((on_phase, on_handler))
+        self._plan = None
+
+    def iter_errors(self, data: dict) -> Iterator[Tuple[str, Any]]:
+        """
+        Lazily validates the TOML data, yielding each error as it is found.
+
+        Args:
+            data: dict - The TOML data to validate.
+        Returns:
+            Iterator[Tuple[str, Any]] - The key and error of each error.
+        Raises:
+            TypeError - If data is not a dictionary.
+            TOMLHandlerError - If any of the handlers are invalid.
+        """
 
-    def validate(self, data: dict) -> dict:
+        # Invalid type
+        if not isinstance(data, dict):
+            raise TypeError("Data must be a dictionary.")
+
+        return self.compile().iter_errors(data)
+
+    def validate(self, data: dict, max_errors: int | None = None) -> dict:
         """
         Validates the TOML data.
 
         Args:
             data: dict - The TOML data to validate.
+            max_errors?: int | None - Stop validating after this
+            many errors have been found.
         Returns:
             dict - The errors in the data.
         Raises:
             TypeError - If data is not a dictionary.
+            ValueError - If max_errors is less than 1.
+            TOMLHandlerError - If any of the handlers are invalid.
+        """
+
+        # Invalid limit
+        if max_errors is not None and max_errors < 1:
+            raise ValueError("max_errors must be at least 1.")
+
+        return dict(itertools.islice(self.iter_errors(data), max_errors))
+
+    async def avalidate(
+        self, data: dict, concurrency: int | None = None
+    ) -> dict:
+        """
+        Validates the TOML data, running async handlers concurrently.
+
+        Synchronous handlers run inline, while async handlers are
+        awaited together, with at most 'concurrency' running at once.
+
+        Args:
+            data: dict - The TOML data to validate.
+            concurrency?: int | None - The maximum number of async
+            handlers running at once, unlimited if None.
+        Returns:
+            dict - The errors in the data.
+        Raises:
+            TypeError - If data is not a dictionary.
+            ValueError - If concurrency is less than 1.
             TOMLHandlerError - If any of the handlers are invalid.
         """
 
@@ -198,74 +385,278 @@ class TOMLValidator:
         if not isinstance(data, dict):
             raise TypeError("Data must be a dictionary.")
 
-        # Map handlers
-        _data = flatten(data)
-        _handlers = self._map_handlers(_data)
-
-        # Run handlers
-        def _run_handler(key: str, value: Any) -> Any:
-            """Run a handler and return the result."""
-            _handler = _handlers[key]
-
-            # Regex pattern
-            if isinstance(_handler, re.Pattern):
-                if not isinstance(value, str):
-                    return self._on_type_mismatch(
-                        key=key, expected="str", got=type(value)
-                    )
-                if not _handler.fullmatch(value):
-                    return self._on_pattern_mismatch(
-                        key, value=value, pattern=_handler
-                    )
-                return False
-
-            # Built-in type
-            if isinstance(_handler, type) and not isinstance(value, _handler):
-                return self._on_type_mismatch(
-                    key=key, expected=_handler, got=type(value)
-                )
+        # Invalid limit
+        if concurrency is not None and concurrency < 1:
+            raise ValueError("concurrency must be at least 1.")
 
-            # Function
-            if inspect.isfunction(_handler):
-                _params = list(inspect.signature(_handler).parameters)
+        return {
+            k: v
+            async for k, v in self.compile().aiter_errors(data, concurrency)
+        }
+
+    def is_valid(self, data: dict) -> bool:
+        """
+        Checks if the TOML data is valid, stopping at the first error.
 
-                # No parameters
-                if len(_params) == 0:
-                    return _handler()
+        Args:
+            data: dict - The TOML data to validate.
+        Returns:
+            bool - True if the data has no errors, False otherwise.
+        Raises:
+            TypeError - If data is not a dictionary.
+            TOMLHandlerError - If any of the handlers are invalid.
+        """
+        return next(self.iter_errors(data), None) is None
 
-                # One parameter
-                if len(_params) == 1:
-                    # Key
-                    if _params[0] == "key":
-                        return _handler(key)
-                    # Value
-                    if _params[0] == "value":
-                        return _handler(value)
-                    # Unexpected parameter
-                    raise TOMLHandlerError("Got unexpected parameter.")
+    def session(self, data: dict) -> TOMLSession:
+        """
+        Validates the TOML data, returning a session that keeps
+        the errors current as the data changes.
 
-                # Two parameters
-                if len(_params) == 2:
-                    return _handler(key, value)
+        Args:
+            data: dict - The TOML data to validate.
+        Returns:
+            TOMLSession - The validation session.
+        Raises:
+            TypeError - If data is not a dictionary.
+            TOMLHandlerError - If any of the handlers are invalid.
+        """
+        return TOMLSession(self.compile(), data)
 
-                # More than two parameters
-                raise TOMLHandlerError("Handler must have 0-2 parameters.")
+    def validate_many(
+        self,
+        documents: Iterable[dict],
+        workers: int | None = 1,
+        executor: ExecutorType = "thread",
+        ordered: bool = True,
+        chunksize: int = 1,
+    ) -> Iterator[dict] | Iterator[Tuple[int, dict]]:
+        """
+        Validates a stream of TOML documents against the same plan.
 
-            return False
+        The plan is compiled once before any document is validated. In
+        process mode, the workers are forked with the validator inherited
+        rather than pickled, so handlers such as lambdas are supported on
+        platforms with the 'fork' start method.
 
-        _results = {}
-        for k, v in _data.items():
-            if k in _handlers:
-                _results[k] = _run_handler(k, v)
+        Args:
+            documents: Iterable[dict] - The TOML documents to validate.
+            workers?: int | None - The number of workers. If 1, the
+            documents are validated in the current thread. If None, the
+            number of CPUs is used.
+            executor?: Literal["thread", "process"] - The type of pool.
+            ordered?: bool - Whether to yield the errors in input order.
+            If False, (index, errors) tuples are yielded as soon as each
+            document has been validated.
+            chunksize?: int - The number of documents sent to a
+            worker at once.
+        Returns:
+            Iterator[dict] | Iterator[Tuple[int, dict]] - The errors of
+            each document.
+        Raises:
+            ValueError - If the executor, workers or chunksize are invalid.
+            TOMLHandlerError - If any of the handlers are invalid.
+        """
+        self.compile()
+
+        if executor not in ("thread", "process"):
+            raise ValueError("Executor must be either 'thread' or 'process'.")
+
+        if workers == 1:
+            results = ((i, self.validate(d)) for i, d in enumerate(documents))
+        elif executor == "process":
+            results = pool_map(
+                _validate_in_worker,
+                documents,
+                workers=workers,
+                executor=executor,
+                ordered=ordered,
+                chunksize=chunksize,
+                initializer=_init_worker,
+                initargs=(self,),
+            )
+        else:
+            results = pool_map(
+                self.validate,
+                documents,
+                workers=workers,
+                executor=executor,
+                ordered=ordered,
+                chunksize=chunksize,
+            )
 
-        # Missing keys
-        _missing_keys = self._schema.compare_keys(_data)
-        _results.update({k: self._on_missing(k) for k in _missing_keys})
+        if ordered:
+            return (errors for _, errors in results)
+        return results
 
-        # Remove valid keys
-        _results = {k: v for k, v in _results.items() if v}
+    def validate_file(
+        self, path: PathOrStr, cache: TOMLFileCache | None = None
+    ) -> dict:
+        """
+        Parses and validates a TOML file.
 
-        return _results
+        Args:
+            path: PathOrStr - The path of the TOML file.
+            cache?: TOMLFileCache | None - A cache of validation results,
+            used to skip the file if it is unchanged.
+        Returns:
+            dict - The errors in the file.
+        Raises:
+            TypeError - If the path is not a string or pathlib.Path object.
+            OSError - If the file cannot be read.
+            tomllib.TOMLDecodeError - If the file is not valid TOML.
+            TOMLHandlerError - If any of the handlers are invalid.
+        """
+        [(_, errors)] = self.validate_files([path], cache=cache)
+        return errors
+
+    def validate_files(
+        self,
+        paths: Iterable[PathOrStr],
+        workers: int | None = 1,
+        executor: ExecutorType = "process",
+        cache: TOMLFileCache | None = None,
+    ) -> Iterator[Tuple[pathlib.Path, dict]]:
+        """
+        Parses and validates TOML files, optionally in parallel.
+
+        Each file is parsed and validated in one step by the same worker.
+        If a cache is provided, files with the same modification time and
+        size, or the same content hash, as when they were last validated
+        by an identical validator are neither parsed nor validated again.
+        The cache is saved once every file has been validated, or when
+        the iteration stops early.
+
+        Args:
+            paths: Iterable[PathOrStr] - The paths of the TOML files.
+            workers?: int | None - The number of workers. If 1, the files
+            are validated in the current thread. If None, the number of
+            CPUs is used.
+            executor?: Literal["thread", "process"] - The type of pool.
+            cache?: TOMLFileCache | None - A cache of validation results.
+        Returns:
+            Iterator[Tuple[pathlib.Path, dict]] - The path and errors of
+            each file, in input order.
+        Raises:
+            TypeError - If a path is not a string or pathlib.Path object.
+            ValueError - If the executor or workers are invalid.
+            OSError - If a file cannot be read.
+            tomllib.TOMLDecodeError - If a file is not valid TOML.
+            TOMLHandlerError - If any of the handlers are invalid.
+        """
+        plan = self.compile()
+        _paths = [to_path(path) for path in paths]
+
+        if executor not in ("thread", "process"):
+            raise ValueError("Executor must be either 'thread' or 'process'.")
+
+        # Cached files
+        _entries = []
+        _stats = []
+        _jobs = []
+        _pending = []
+        for path in _paths:
+            stat = path.stat()
+            entry = None if cache is None else cache.get(plan.fingerprint, path)
+            if entry is not None and (entry.mtime_ns, entry.size) == (
+                stat.st_mtime_ns,
+                stat.st_size,
+            ):
+                stat = None
+            else:
+                _jobs.append((path, None if entry is None else entry.digest))
+                _pending.append(len(_entries))
+            _entries.append(entry)
+            _stats.append(stat)
+
+        # Parse and validate changed files
+        if workers == 1:
+            results = (
+                (i, _validate_file(self, *job)) for i, job in enumerate(_jobs)
+            )
+        elif executor == "process":
+            results = pool_map(
+                _validate_file_in_worker,
+                _jobs,
+                workers=workers,
+                executor=executor,
+                initializer=_init_worker,
+                initargs=(self,),
+            )
+        else:
+            results = pool_map(
+                lambda job: _validate_file(self, *job),
+                _jobs,
+                workers=workers,
+                executor=executor,
+            )
+
+        def _cached(
+            start: int, stop: int
+        ) -> Iterator[Tuple[pathlib.Path, dict]]:
+            for path, entry in zip(_paths[start:stop], _entries[start:stop]):
+                yield path, dict(entry.errors)
+
+        def _results() -> Iterator[Tuple[pathlib.Path, dict]]:
+            position = 0
+            try:
+                for idx, (_, (digest, errors)) in zip(_pending, results):
+                    # Files served from the cache before this one
+                    yield from _cached(position, idx)
+                    position = idx + 1
+
+                    path, entry, stat = _paths[idx], _entries[idx], _stats[idx]
+                    if errors is None:
+                        errors = entry.errors
+
+                    if cache is not None:
+                        cache.set(
+                            plan.fingerprint,
+                            path,
+                            TOMLFileCacheEntry(
+                                stat.st_mtime_ns, stat.st_size, digest, errors
+                            ),
+                        )
+
+                    yield path, dict(errors)
+
+                if _pending and position <= _pending[-1]:
+                    raise RuntimeError("Not every file was validated.")
+                yield from _cached(position, len(_paths))
+            finally:
+                # Keep the files validated so far, even if one failed
+                if cache is not None:
+                    cache.save()
+
+        return _results()
+
+    def stats(self) -> dict:
+        """
+        Get the statistics collected by the profiler.
+
+        Args:
+            None
+        Returns:
+            dict - The count, total, mean and max wall time in seconds,
+            and error count, of each handler pattern under 'handlers'
+            and of each validation phase under 'phases'.
+        Raises:
+            ValueError - If profiling is disabled.
+        """
+        if self._profiler is None:
+            raise ValueError("Profiling is disabled, use 'profile=True'.")
+
+        return self._profiler.stats()
+
+    @property
+    def profiler(self) -> TOMLProfiler | None:
+        """The profiler of the validator, if profiling is enabled."""
+        return self._profiler
+
+    @property
+    def memo(self) -> LRUCache:
+        """The cache of pure handler results, with hit and miss counters."""
+        return self._memo
 
     @property
     def handlers(self) -> dict:
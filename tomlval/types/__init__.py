@@ -1,4 +1,5 @@
 """Types for the TOML parser."""
 
 from tomlval.types.handler import Handler
+from tomlval.types.handler_kind import HandlerKind
 from tomlval.types.path_or_str import PathOrStr
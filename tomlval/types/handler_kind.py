@@ -0,0 +1,19 @@
+"""Dispatch tags for validation handlers."""
+
+from enum import Enum
+
+
+class HandlerKind(Enum):
+    """The kind of a handler, deciding how it is called."""
+
+    NONE = "none"
+    TYPE = "type"
+    TYPES = "types"
+    PATTERN = "pattern"
+    COMPOSITE = "composite"
+    ARRAY = "array"
+    CALL = "call"
+    CALL_KEY = "call_key"
+    CALL_VALUE = "call_value"
+    CALL_KEY_VALUE = "call_key_value"
+    BATCH = "batch"
@@ -1,9 +1,20 @@
-""" 'tomlval.utils' module containing utilities used throughout the project. """
+"""'tomlval.utils' module containing utilities used throughout the project."""
 
+from .adapt_handler import HandlerAdapter, adapt_handler, classify_handler
+from .codegen import generate_walker
+from .column_walker import ColumnWalker
+from .fingerprint import fingerprint
+from .flat_path import FlatPath
 from .flatten import flatten, flatten_all, flatten_schema
+from .format_key import format_key
 from .is_handler import is_handler
 from .is_toml import is_toml
+from .key_matcher import KeyMatcher
+from .lru_cache import LRUCache
+from .markers import batch, expensive, is_batch, is_expensive, is_pure, pure
+from .pool import pool_map
 from .regex import dict_key_pattern, key_pattern, nested_array_pattern
 from .stringify import stringify_schema
+from .subtree_walker import SubtreeWalker
 from .to_path import to_path
 from .unflatten import unflatten
@@ -0,0 +1,537 @@
+"""Module to wrap a handler into a precomputed call adapter."""
+
+# pylint: disable=R0911
+
+import inspect
+import re
+from itertools import repeat
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    List,
+    Mapping,
+    Sequence,
+    Tuple,
+)
+
+from tomlval.errors import TOMLHandlerError
+from tomlval.types import HandlerKind
+from tomlval.utils.format_key import format_key
+from tomlval.utils.lru_cache import LRUCache
+from tomlval.utils.markers import is_batch, is_expensive, is_pure
+
+Key = str | Sequence[str | int]
+Call = Callable[[Key, Any], Any]
+AsyncCall = Callable[[Key, Any], Awaitable[Any]]
+Render = Callable[[str], Any]
+Check = Callable[[Any], Render | None]
+Batch = Callable[[Sequence[Any]], List[Tuple[int, Any]]]
+
+
+class HandlerAdapter:
+    """A handler wrapped into a call with a known signature."""
+
+    __slots__ = (
+        "handler",
+        "kind",
+        "call",
+        "acall",
+        "expensive",
+        "check",
+        "batch",
+    )
+
+    def __init__(
+        self,
+        handler: Any,
+        kind: HandlerKind,
+        call: Call,
+        acall: AsyncCall | None = None,
+        expensive: bool = False,
+        check: Check | None = None,
+        batch: Batch | None = None,
+    ):
+        """
+        Initialize a new handler adapter.
+
+        Args:
+            handler: Any - The wrapped handler.
+            kind: HandlerKind - The dispatch tag of the handler.
+            call: Callable[[Key, Any], Any] - The function that runs the
+            handler for a key and a value. The key is either a flattened
+            key or a path of segments, formatted only when it is needed.
+            acall?: Callable[[Key, Any], Awaitable[Any]] | None - The
+            coroutine function that runs the handler, if it is async.
+            expensive?: bool - Whether the handler may run in an executor.
+            check?: Callable[[Any], Render | None] | None - The function
+            that runs the handler for a value only, returning None if the
+            value is valid, or a function that renders the error for a
+            key. None if the result of the handler depends on the key.
+            batch?: Callable[[Sequence[Any]], List[Tuple[int, Any]]] | None
+            - The function that runs a batch handler for every value of
+            its pattern at once, returning the errors by index.
+        Returns:
+            None
+        Raises:
+            None
+        """
+        self.handler = handler
+        self.kind = kind
+        self.call = call
+        self.acall = acall
+        self.expensive = expensive
+        self.check = check
+        self.batch = batch
+
+    def __repr__(self) -> str:
+        return f"<HandlerAdapter kind={self.kind.value}>"
+
+    def __call__(self, key: Key, value: Any) -> Any:
+        return self.call(key, value)
+
+
+_async_calls = {
+    HandlerKind.CALL: lambda fn, key, value: fn(),
+    HandlerKind.CALL_KEY: lambda fn, key, value: fn(format_key(key)),
+    HandlerKind.CALL_VALUE: lambda fn, key, value: fn(value),
+    HandlerKind.CALL_KEY_VALUE: lambda fn, key, value: fn(
+        key=format_key(key), value=value
+    ),
+}
+
+
+# Whether the result of each function kind depends on the key
+_memo_key_kinds = {
+    HandlerKind.CALL: False,
+    HandlerKind.CALL_KEY: True,
+    HandlerKind.CALL_VALUE: False,
+    HandlerKind.CALL_KEY_VALUE: True,
+}
+
+
+def classify_handler(handler: Any) -> HandlerKind:
+    """
+    Get the dispatch tag of a handler.
+
+    Args:
+        handler: Any - The handler to classify.
+    Returns:
+        HandlerKind - The kind of the handler.
+    Raises:
+        TOMLHandlerError - If a function handler has invalid parameters.
+    """
+    if isinstance(handler, type):
+        return HandlerKind.TYPE
+
+    if isinstance(handler, re.Pattern):
+        return HandlerKind.PATTERN
+
+    if isinstance(handler, tuple):
+        if all(isinstance(h, type) for h in handler):
+            return HandlerKind.TYPES
+        return HandlerKind.COMPOSITE
+
+    if isinstance(handler, list):
+        return HandlerKind.ARRAY
+
+    if not inspect.isfunction(handler):
+        return HandlerKind.NONE
+
+    params = tuple(inspect.signature(handler).parameters)
+
+    if is_batch(handler):
+        if len(params) != 1:
+            raise TOMLHandlerError("Batch handler must have 1 parameter.")
+        return HandlerKind.BATCH
+
+    if len(params) == 0:
+        return HandlerKind.CALL
+
+    if len(params) == 1:
+        if params[0] == "key":
+            return HandlerKind.CALL_KEY
+        if params[0] == "value":
+            return HandlerKind.CALL_VALUE
+        raise TOMLHandlerError("Got unexpected parameter.")
+
+    if len(params) == 2:
+        return HandlerKind.CALL_KEY_VALUE
+
+    raise TOMLHandlerError("Handler must have 0-2 parameters.")
+
+
+def adapt_handler(
+    handler: Any,
+    on_type_mismatch: Callable[..., Any],
+    on_pattern_mismatch: Callable[..., Any],
+    memo: LRUCache | None = None,
+    memoize: bool = False,
+) -> HandlerAdapter:
+    """
+    Wrap a handler into a call adapter.
+
+    The handler is classified once, so running the adapter does not
+    need to inspect the handler again.
+
+    Tuples are alternatives, where the value must be an instance of one
+    of the types and pass every other handler. Lists are arrays, where
+    each element must satisfy the tuple of the list items.
+
+    Adapters of async functions, or of tuples and lists containing them,
+    have an 'acall' coroutine function, and raise an error when called
+    synchronously. Likewise, adapters of handlers marked as expensive,
+    or of tuples and lists containing them, are marked as expensive.
+
+    If a memo cache is given, the results of function handlers marked
+    as pure are cached by the handler, the value and, if the handler
+    accepts it, the key. With memoize, every function handler is
+    treated as pure and regex matches are cached too.
+
+    Batch handlers get a 'batch' function, which runs them for a list of
+    values, while their call runs them for a single value.
+
+    Handlers whose result does not depend on the key, other than through
+    the mismatch callbacks, also get a key-free check, which allows
+    their failures to be cached and rendered again for another key.
+    Async and expensive handlers do not get a check.
+
+    Args:
+        handler: Any - The handler to wrap.
+        on_type_mismatch: Callable[..., Any] - The type mismatch callback.
+        on_pattern_mismatch: Callable[..., Any] - The pattern mismatch
+        callback.
+        memo?: LRUCache | None - The cache of handler results.
+        memoize?: bool - Whether to cache every handler.
+    Returns:
+        HandlerAdapter - The call adapter.
+    Raises:
+        TOMLHandlerError - If a function handler has invalid parameters.
+    """
+    kind = classify_handler(handler)
+    _acall = None
+    _check = None
+    _batch = None
+    _expensive = is_expensive(handler)
+
+    if kind in (HandlerKind.TYPE, HandlerKind.TYPES):
+
+        def _call(key: Key, value: Any) -> Any:
+            if isinstance(value, handler):
+                return False
+            return on_type_mismatch(
+                key=format_key(key), expected=handler, got=type(value)
+            )
+
+        def _check(value: Any) -> Render | None:
+            if isinstance(value, handler):
+                return None
+            return _type_mismatch(on_type_mismatch, handler, type(value))
+
+    elif kind is HandlerKind.PATTERN:
+        fullmatch = handler.fullmatch
+
+        if memo is not None and memoize:
+
+            def _fullmatch(value: str) -> bool:
+                return memo.get_or_call((handler, value), _matches, value)
+
+            def _matches(value: str) -> bool:
+                return handler.fullmatch(value) is not None
+
+            fullmatch = _fullmatch
+
+        def _call(key: Key, value: Any) -> Any:
+            if not isinstance(value, str):
+                return on_type_mismatch(
+                    key=format_key(key), expected="str", got=type(value)
+                )
+            if not fullmatch(value):
+                return on_pattern_mismatch(
+                    format_key(key), value=value, pattern=handler
+                )
+            return False
+
+        def _check(value: Any) -> Render | None:
+            if not isinstance(value, str):
+                return _type_mismatch(on_type_mismatch, "str", type(value))
+            if not fullmatch(value):
+                return lambda key: on_pattern_mismatch(
+                    key, value=value, pattern=handler
+                )
+            return None
+
+    elif kind is HandlerKind.COMPOSITE:
+        types = tuple(h for h in handler if isinstance(h, type))
+        adapters = tuple(
+            adapt_handler(
+                h, on_type_mismatch, on_pattern_mismatch, memo, memoize
+            )
+            for h in handler
+            if not isinstance(h, type)
+        )
+        checks = tuple(a.call for a in adapters)
+        _expensive = any(a.expensive for a in adapters)
+
+        def _call(key: Key, value: Any) -> Any:
+            if types and not isinstance(value, types):
+                return on_type_mismatch(
+                    key=format_key(key), expected=types, got=type(value)
+                )
+            for check in checks:
+                if result := check(key, value):
+                    return result
+            return False
+
+        if all(a.check for a in adapters):
+            sub_checks = tuple(a.check for a in adapters)
+
+            def _check(value: Any) -> Render | None:
+                if types and not isinstance(value, types):
+                    return _type_mismatch(on_type_mismatch, types, type(value))
+                for i, check in enumerate(sub_checks):
+                    if render := check(value):
+                        return _then(
+                            render, [(c, value) for c in checks[i + 1 :]]
+                        )
+                return None
+
+        if any(a.acall for a in adapters):
+
+            async def _acall(key: Key, value: Any) -> Any:
+                if types and not isinstance(value, types):
+                    return on_type_mismatch(
+                        key=format_key(key), expected=types, got=type(value)
+                    )
+                for a in adapters:
+                    if a.acall is None:
+                        result = a.call(key, value)
+                    else:
+                        result = await a.acall(key, value)
+                    if result:
+                        return result
+                return False
+
+    elif kind is HandlerKind.ARRAY:
+        adapter = adapt_handler(
+            tuple(handler), on_type_mismatch, on_pattern_mismatch, memo, memoize
+        )
+        element = adapter.call
+        _expensive = adapter.expensive
+
+        # Arrays of types are checked in bulk, up to the first mismatch
+        def _call(key: Key, value: Any) -> Any:
+            if not isinstance(value, list):
+                return on_type_mismatch(
+                    key=format_key(key), expected=list, got=type(value)
+                )
+            for i in range(first_mismatch(adapter, value), len(value)):
+                if result := element(key, value[i]):
+                    return result
+            return False
+
+        if adapter.check is not None:
+            element_check = adapter.check
+
+            def _check(value: Any) -> Render | None:
+                if not isinstance(value, list):
+                    return _type_mismatch(on_type_mismatch, list, type(value))
+                for i in range(first_mismatch(adapter, value), len(value)):
+                    if render := element_check(value[i]):
+                        return _then(
+                            render, [(element, v) for v in value[i + 1 :]]
+                        )
+                return None
+
+        if adapter.acall is not None:
+
+            async def _acall(key: Key, value: Any) -> Any:
+                if not isinstance(value, list):
+                    return on_type_mismatch(
+                        key=format_key(key), expected=list, got=type(value)
+                    )
+                for item in value:
+                    if result := await adapter.acall(key, item):
+                        return result
+                return False
+
+    elif kind is HandlerKind.BATCH:
+        if inspect.iscoroutinefunction(handler):
+            raise TOMLHandlerError("Batch handler must not be async.")
+        _expensive = False
+
+        def _batch(values: Sequence[Any]) -> List[Tuple[int, Any]]:
+            return _batch_errors(handler(values), len(values))
+
+        # A single value is run as a batch of one
+        def _call(key: Key, value: Any) -> Any:
+            for _, result in _batch([value]):
+                return result
+            return False
+
+    elif inspect.iscoroutinefunction(handler):
+        call = _async_calls[kind]
+
+        def _call(key: Key, value: Any) -> Any:
+            raise TOMLHandlerError(
+                f"Handler of '{format_key(key)}' is async, use 'avalidate'."
+            )
+
+        async def _acall(key: Key, value: Any) -> Any:
+            return await call(handler, key, value)
+
+    elif kind is HandlerKind.CALL:
+
+        def _call(key: Key, value: Any) -> Any:
+            return handler()
+
+    elif kind is HandlerKind.CALL_KEY:
+
+        def _call(key: Key, value: Any) -> Any:
+            return handler(format_key(key))
+
+    elif kind is HandlerKind.CALL_VALUE:
+
+        def _call(key: Key, value: Any) -> Any:
+            return handler(value)
+
+    elif kind is HandlerKind.CALL_KEY_VALUE:
+
+        def _call(key: Key, value: Any) -> Any:
+            return handler(key=format_key(key), value=value)
+
+    else:
+
+        def _call(key: Key, value: Any) -> Any:
+            return False
+
+        def _check(value: Any) -> Render | None:
+            return None
+
+    if (
+        memo is not None
+        and kind in _memo_key_kinds
+        and _acall is None
+        and (memoize or is_pure(handler))
+    ):
+        _call = _memoize(_call, handler, _memo_key_kinds[kind], memo)
+
+    # Function handlers that do not accept the key
+    if _memo_key_kinds.get(kind) is False:
+        _check = _constant_check(_call)
+
+    if _expensive or _acall is not None:
+        _check = None
+
+    return HandlerAdapter(
+        handler, kind, _call, _acall, _expensive, _check, _batch
+    )
+
+
+def first_mismatch(adapter: HandlerAdapter, values: Sequence[Any]) -> int:
+    """
+    Get the index of the first value that the check of an adapter may
+    fail. Values for a type or tuple of types are checked in a single
+    pass, while any other value may fail.
+
+    Args:
+        adapter: HandlerAdapter - The call adapter.
+        values: Sequence[Any] - The values to check.
+    Returns:
+        int - The index of the first value to check, or the number of
+        values if they all pass.
+    Raises:
+        None
+    """
+    if adapter.check is None or adapter.kind not in (
+        HandlerKind.TYPE,
+        HandlerKind.TYPES,
+    ):
+        return 0
+
+    types = adapter.handler
+    if all(map(isinstance, values, repeat(types))):
+        return len(values)
+    return list(map(isinstance, values, repeat(types))).index(False)
+
+
+def _batch_errors(result: Any, size: int) -> List[Tuple[int, Any]]:
+    """
+    Get the errors of a batch handler by index, from a mapping of
+    indexes or a sequence with a result for each value.
+    """
+    if not result:
+        return []
+
+    if isinstance(result, Mapping):
+        items = result.items()
+    elif isinstance(result, Sequence) and not isinstance(result, str):
+        items = enumerate(result)
+    else:
+        raise TOMLHandlerError(
+            "Batch handler must return a mapping or a sequence."
+        )
+
+    errors = []
+    for idx, error in items:
+        if not error:
+            continue
+        if not isinstance(idx, int) or not 0 <= idx < size:
+            raise TOMLHandlerError(
+                f"Batch handler returned an invalid index {idx!r}."
+            )
+        errors.append((idx, error))
+
+    errors.sort(key=lambda e: e[0])
+    return errors
+
+
+def _type_mismatch(
+    on_type_mismatch: Callable[..., Any], expected: Any, got: type
+) -> Render:
+    """Render a type mismatch for a key."""
+    return lambda key: on_type_mismatch(key=key, expected=expected, got=got)
+
+
+def _then(render: Render, rest: Sequence[Tuple[Call, Any]]) -> Render:
+    """Render an error, running the remaining calls if it is falsy."""
+
+    def _render(key: str) -> Any:
+        if result := render(key):
+            return result
+        for call, value in rest:
+            if result := call(key, value):
+                return result
+        return False
+
+    return _render
+
+
+def _constant_check(call: Call) -> Check:
+    """Create a check for a call that does not depend on the key."""
+
+    def _check(value: Any) -> Render | None:
+        if result := call(None, value):
+            return lambda key: result
+        return None
+
+    return _check
+
+
+def _memoize(call: Call, handler: Any, uses_key: bool, memo: LRUCache) -> Call:
+    """Cache the results of a call adapter."""
+
+    def _call(key: Key, value: Any) -> Any:
+        memo_key = (
+            handler,
+            format_key(key) if uses_key else None,
+            type(value),
+            value,
+        )
+        try:
+            hash(memo_key)
+        except TypeError:
+            return call(key, value)
+        return memo.get_or_call(memo_key, call, key, value)
+
+    return _call
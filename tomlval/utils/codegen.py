@@ -0,0 +1,423 @@
+"""Module to generate a specialized walker for a set of handler patterns."""
+
+# pylint: disable=R0913,R0914,W0122
+
+import itertools
+import linecache
+import weakref
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+
+from tomlval.types import HandlerKind
+from tomlval.utils.adapt_handler import HandlerAdapter
+from tomlval.utils.format_key import format_key
+
+_plan_ids = itertools.count()
+
+Walker = Callable[..., Any]
+
+
+class _Entry:
+    """The known variants of a key in a table."""
+
+    __slots__ = ("leaf", "table", "array")
+
+    def __init__(self):
+        self.leaf = False
+        self.table: _Table | None = None
+        self.array: _Table | None = None
+
+
+class _Table:
+    """A table at a known shape, with the keys of its patterns."""
+
+    __slots__ = ("shape", "prefix", "keys")
+
+    def __init__(self, shape: Tuple[str, ...], prefix: str | None):
+        self.shape = shape
+        self.prefix = prefix
+        self.keys: Dict[str, _Entry] = {}
+
+    def child(self, segment: str, array: bool) -> "_Table":
+        """Get the table of a key, or of the elements of an array."""
+        entry = self.keys.setdefault(segment.removesuffix("[]"), _Entry())
+        if array:
+            if entry.array is None:
+                entry.array = _Table(self.shape + (segment,), None)
+            return entry.array
+        if entry.table is None:
+            prefix = None
+            if self.prefix is not None:
+                prefix = f"{self.prefix}.{segment}" if self.prefix else segment
+            entry.table = _Table(self.shape + (segment,), prefix)
+        return entry.table
+
+
+def _index(patterns: Iterable[str]) -> _Table:
+    """Build the tree of known tables from the patterns without wildcards."""
+    root = _Table((), "")
+
+    for pattern in patterns:
+        if "*" in pattern:
+            continue
+        segments = pattern.split(".")
+        table = root
+        for segment in segments[:-1]:
+            table = table.child(segment, segment.endswith("[]"))
+        if not segments[-1].endswith("[]"):
+            table.keys.setdefault(segments[-1], _Entry()).leaf = True
+
+    return root
+
+
+class _Generator:
+    """The state of a single code generation."""
+
+    def __init__(
+        self,
+        resolve: Callable[[Tuple[str, ...]], HandlerAdapter | None],
+        inline: Callable[[HandlerAdapter], bool],
+    ):
+        self.resolve = resolve
+        self.inline = inline
+        self.namespace: Dict[str, Any] = {"_fk": format_key}
+        self.lines: List[str] = []
+
+    def constant(self, prefix: str, value: Any) -> str:
+        """Add a constant to the namespace and get its name."""
+        name = f"{prefix}{len(self.namespace)}"
+        self.namespace[name] = value
+        return name
+
+    def table(self, table: _Table) -> str:
+        """
+        Generate the function of a table and get its name.
+
+        Keys that are only values get a function that checks a value
+        and returns the error, if any, while keys that may be tables
+        or arrays of tables are written out in the table function.
+        """
+        leaves = {}
+        functions: Dict[Any, str] = {}
+        nested = []
+        for key, entry in table.keys.items():
+            if entry.table is None and entry.array is None:
+                leaves[key] = (
+                    self.leaf(table, key, functions),
+                    self.constant("_s", table.shape + (key,)),
+                )
+            else:
+                nested.append(
+                    (
+                        key,
+                        entry,
+                        entry.table and self.table(entry.table),
+                        entry.array and self.table(entry.array),
+                    )
+                )
+
+        name = self.constant("_t", None)
+        shape = self.constant("_s", table.shape)
+        fallback = f"yield from walk({{key: value}}, path, {shape}, provided)"
+        lines = [
+            "",
+            f"# {'.'.join(table.shape) or '(root)'}",
+            f"def {name}(node, path, provided):",
+            "    for key, value in node.items():",
+        ]
+
+        if leaves:
+            _leaves = self.constant("_l", None)
+            lines[1:1] = [
+                f"{_leaves} = {{",
+                *(f"    {k!r}: ({f}, {s})," for k, (f, s) in leaves.items()),
+                "}",
+                "",
+            ]
+            lines.extend(
+                [
+                    f"        leaf = {_leaves}.get(key)",
+                    "        if leaf is not None"
+                    " and not isinstance(value, (dict, list)):",
+                    "            provided.add(leaf[1])",
+                    "            if error := leaf[0](key, value, path):",
+                    "                yield error",
+                    "            continue",
+                ]
+            )
+
+        if not nested:
+            lines.append(f"        {fallback}")
+            self.lines.extend(lines)
+            return name
+
+        cases = self.constant("_c", {k[0]: i for i, k in enumerate(nested)})
+        lines.extend(
+            [
+                f"        case = {cases}.get(key, -1)",
+                "        if case < 0:",
+                f"            {fallback}",
+                "        else:",
+            ]
+        )
+
+        # Binary search over the cases
+        def _cases(lo: int, hi: int, indent: str) -> None:
+            if hi - lo == 1:
+                lines.extend(
+                    f"{indent}{line}"
+                    for line in self.entry(table, *nested[lo], fallback)
+                )
+                return
+            mid = (lo + hi) // 2
+            lines.append(f"{indent}if case < {mid}:")
+            _cases(lo, mid, indent + "    ")
+            lines.append(f"{indent}else:")
+            _cases(mid, hi, indent + "    ")
+
+        _cases(0, len(nested), " " * 12)
+
+        self.lines.extend(lines)
+        return name
+
+    def leaf(self, table: _Table, key: str, functions: Dict[Any, str]) -> str:
+        """
+        Generate the function that checks a value at a known key, and
+        returns the error, if any. The keys of a table with the same
+        handler share the function.
+        """
+        adapter = self.resolve(table.shape + (key,))
+        group: Any = None
+        if adapter is not None:
+            group = id(adapter.handler) if self.inline(adapter) else id(adapter)
+
+        if (name := functions.get(group)) is None:
+            name = functions[group] = self.constant("_v", None)
+            self.lines.extend(
+                [
+                    "",
+                    f"def {name}(key, value, path):",
+                    *(f"    {line}" for line in self.check(table, key, False)),
+                    "    return None",
+                ]
+            )
+        return name
+
+    def entry(
+        self,
+        table: _Table,
+        key: str,
+        entry: _Entry,
+        table_fn: str | None,
+        array_fn: str | None,
+        fallback: str,
+    ) -> List[str]:
+        """Generate the code of a key that may be a table or an array."""
+        lines = [f"# {key!r}", "if isinstance(value, dict):"]
+
+        # Table
+        if table_fn is not None:
+            lines.extend(
+                [
+                    "    path.append(key)",
+                    f"    yield from {table_fn}(value, path, provided)",
+                    "    path.pop()",
+                ]
+            )
+        else:
+            lines.append(f"    {fallback}")
+
+        # Array
+        lines.append("elif isinstance(value, list):")
+        if array_fn is not None:
+            fallback_scalars = fallback.replace("value}", "scalars}")
+            lines.extend(
+                [
+                    "    scalars = []",
+                    "    path.append(key)",
+                    "    for idx, item in enumerate(value):",
+                    "        if isinstance(item, dict):",
+                    "            path.append(idx)",
+                    f"            yield from {array_fn}(item, path, provided)",
+                    "            path.pop()",
+                    "        else:",
+                    "            scalars.append(item)",
+                    "    path.pop()",
+                    "    if scalars:",
+                    f"        {fallback_scalars}",
+                ]
+            )
+        else:
+            lines.append(f"    {fallback}")
+
+        # Value
+        lines.append("else:")
+        if entry.leaf:
+            shape = self.constant("_s", table.shape + (key,))
+            lines.append(f"    provided.add({shape})")
+            lines.extend(f"    {line}" for line in self.check(table, key, True))
+        else:
+            lines.append(f"    {fallback}")
+
+        return lines
+
+    def check(self, table: _Table, key: str, literal: bool) -> List[str]:
+        """
+        Generate the handler call of a value at a known key. If the key
+        is a literal, the error is yielded, otherwise the key is read
+        from the 'key' variable and the error is returned.
+        """
+        adapter = self.resolve(table.shape + (key,))
+        if adapter is None:
+            return []
+
+        emit = "yield" if literal else "return"
+        _segment = repr(key) if literal else "key"
+        if table.prefix is None:
+            _key = f"_fk(path) + '.' + {_segment}"
+        elif not table.prefix:
+            _key = _segment
+        else:
+            _key = f"{table.prefix + '.'!r} + {_segment}"
+
+        handler = self.constant("_h", adapter.handler)
+        kind = adapter.kind
+
+        if not self.inline(adapter):
+            call = self.constant("_a", adapter.call)
+            if table.prefix is not None:
+                return [
+                    f"if result := {call}({_key}, value):",
+                    f"    {emit} {_key}, result",
+                ]
+            return [
+                f"path.append({_segment})",
+                "try:",
+                f"    if result := {call}(path, value):",
+                f"        {emit} _fk(path), result",
+                "finally:",
+                "    path.pop()",
+            ]
+
+        if kind is HandlerKind.NONE:
+            return []
+
+        if kind in (HandlerKind.TYPE, HandlerKind.TYPES):
+            return [
+                f"if not isinstance(value, {handler}):",
+                f"    _key = {_key}",
+                "    if result := _otm(key=_key, expected="
+                f"{handler}, got=type(value)):",
+                f"        {emit} _key, result",
+            ]
+
+        if kind is HandlerKind.PATTERN:
+            fullmatch = self.constant("_m", adapter.handler.fullmatch)
+            return [
+                "if not isinstance(value, str):",
+                f"    _key = {_key}",
+                "    if result := _otm(key=_key, expected='str',"
+                " got=type(value)):",
+                f"        {emit} _key, result",
+                f"elif {fullmatch}(value) is None:",
+                f"    _key = {_key}",
+                "    if result := _opm(_key, value=value, pattern="
+                f"{handler}):",
+                f"        {emit} _key, result",
+            ]
+
+        if kind is HandlerKind.CALL:
+            return [f"if result := {handler}():", f"    {emit} {_key}, result"]
+
+        if kind is HandlerKind.CALL_VALUE:
+            return [
+                f"if result := {handler}(value):",
+                f"    {emit} {_key}, result",
+            ]
+
+        if kind is HandlerKind.CALL_KEY:
+            return [
+                f"_key = {_key}",
+                f"if result := {handler}(_key):",
+                f"    {emit} _key, result",
+            ]
+
+        return [
+            f"_key = {_key}",
+            f"if result := {handler}(key=_key, value=value):",
+            f"    {emit} _key, result",
+        ]
+
+
+def generate_walker(
+    patterns: Iterable[str],
+    resolve: Callable[[Tuple[str, ...]], HandlerAdapter | None],
+    walk: Walker,
+    on_type_mismatch: Callable[..., Any],
+    on_pattern_mismatch: Callable[..., Any],
+    inline: Callable[[HandlerAdapter], bool],
+) -> Tuple[Walker, str]:
+    """
+    Generate a walker specialized for a set of handler patterns.
+
+    Each table at a known shape gets its own function, which looks up
+    the keys of its patterns in a dictionary and runs their handlers at
+    known keys, with the type checks, regex matches and function calls
+    written out. Any other key, or a value of another shape than the
+    patterns expect, is passed to the generic walker. The errors are
+    yielded in document order, like the generic walker.
+
+    Tuples, lists, async and batch functions, and handlers for which
+    inline returns False, such as memoized handlers, are called through
+    their adapter.
+
+    Args:
+        patterns: Iterable[str] - The handler patterns.
+        resolve: Callable[[Tuple[str, ...]], HandlerAdapter | None] - The
+        function that finds the adapter for an array-normalized path.
+        walk: Callable[..., Any] - The generic walker, called with a
+        table, the path, the shape of the table and the provided keys.
+        on_type_mismatch: Callable[..., Any] - The type mismatch callback.
+        on_pattern_mismatch: Callable[..., Any] - The pattern mismatch
+        callback.
+        inline: Callable[[HandlerAdapter], bool] - Whether the handler of
+        an adapter may be called directly, instead of its call.
+    Returns:
+        Tuple[Callable[..., Any], str] - The walker, called with the
+        document, an empty path and the set of provided keys, and its
+        source.
+    Raises:
+        None
+    """
+
+    def _inline(adapter: HandlerAdapter) -> bool:
+        if adapter.kind in (
+            HandlerKind.COMPOSITE,
+            HandlerKind.ARRAY,
+            HandlerKind.BATCH,
+        ):
+            return False
+        return adapter.acall is None and inline(adapter)
+
+    generator = _Generator(resolve, _inline)
+    generator.namespace.update(
+        walk=walk, _otm=on_type_mismatch, _opm=on_pattern_mismatch
+    )
+    root = generator.table(_index(patterns))
+
+    source = "\n".join(
+        [f'"""Generated walker, starting at {root}."""', *generator.lines, ""]
+    )
+    filename = f"<tomlval-walker-{next(_plan_ids)}>"
+    linecache.cache[filename] = (
+        len(source),
+        None,
+        source.splitlines(True),
+        filename,
+    )
+    exec(compile(source, filename, "exec"), generator.namespace)
+
+    # The source is only kept for tracebacks while the walker is alive
+    walker = generator.namespace[root]
+    weakref.finalize(walker, linecache.cache.pop, filename, None)
+
+    return walker, source
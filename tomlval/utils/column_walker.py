@@ -0,0 +1,226 @@
+"""A walker that checks the tables of an array column by column."""
+
+# pylint: disable=R0913,R0917
+
+from functools import partial
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Set, Tuple
+
+from tomlval.types import HandlerKind
+from tomlval.utils.adapt_handler import HandlerAdapter, first_mismatch
+from tomlval.utils.format_key import format_key
+
+_absent = object()
+
+# The number of tables checked before the first errors are yielded
+_FIRST_CHUNK = 16
+
+Defer = Callable[[List[str | int], HandlerAdapter, Any], None]
+
+# The position, path, adapter and value of a deferred value
+Deferred = Tuple[tuple, tuple, HandlerAdapter, Any]
+
+
+def _scalar_types(adapter: HandlerAdapter) -> bool:
+    """
+    Check if an adapter is a type check that tables and arrays always
+    fail, so that passing values are known to be scalars.
+    """
+    if adapter.kind is HandlerKind.TYPE:
+        types = (adapter.handler,)
+    elif adapter.kind is HandlerKind.TYPES:
+        types = adapter.handler
+    else:
+        return False
+    return not any(
+        issubclass(dict, t)
+        or issubclass(list, t)
+        or issubclass(t, (dict, list))
+        for t in types
+    )
+
+
+def _defer_at(
+    deferred: List[Deferred],
+    order: tuple,
+    path: List[str | int],
+    adapter: HandlerAdapter,
+    value: Any,
+) -> None:
+    """Defer a value found in an array of a table, at its position."""
+    deferred.append((order, tuple(path), adapter, value))
+
+
+class ColumnWalker:
+    """
+    A walker for the tables of an array, which gathers the values of
+    each key from every table, so the handler of the key is resolved
+    once and checked against the whole column, in a single pass for
+    types. The errors are reported in document order.
+    """
+
+    __slots__ = ("resolve", "walk")
+
+    def __init__(
+        self,
+        resolve: Callable[[Tuple[str, ...]], HandlerAdapter | None],
+        walk: Callable[..., Iterator[Tuple[str, Any]]],
+    ):
+        """
+        Initialize a new column walker.
+
+        Args:
+            resolve: Callable[[Tuple[str, ...]], HandlerAdapter | None] -
+            The function that finds the adapter for an array-normalized
+            path.
+            walk: Callable[..., Iterator[Tuple[str, Any]]] - The generic
+            walker, called with a table, the path, the shape of the
+            table, the provided keys and defer, for arrays in the tables.
+        Returns:
+            None
+        Raises:
+            None
+        """
+        self.resolve = resolve
+        self.walk = walk
+
+    def __call__(
+        self,
+        tables: Iterable[Tuple[int, dict]],
+        path: List[str | int],
+        shape: Tuple[str, ...],
+        provided: Set[Tuple[str, ...]],
+        defer: Defer | None,
+    ) -> Iterator[Tuple[str, Any]]:
+        """
+        Walk the tables of an array column by column, in chunks that
+        double in size, yielding the errors of each chunk in document
+        order once its columns are checked. The values of batch handlers
+        are passed to defer in document order as well. A caller that
+        stops at the first error only checks about twice the tables it
+        would have checked row by row.
+
+        Args:
+            tables: Iterable[Tuple[int, dict]] - The index and table of
+            each table in the array, which are only taken as they are
+            checked.
+            path: List[str | int] - The path of the array.
+            shape: Tuple[str, ...] - The array-normalized shape of the
+            array, such as ('servers[]',).
+            provided: Set[Tuple[str, ...]] - The provided shapes, which
+            are added to.
+            defer: Defer | None - The function batch handlers are passed
+            to, instead of being called.
+        Returns:
+            Iterator[Tuple[str, Any]] - The key and error of each error.
+        Raises:
+            TOMLHandlerError - If a handler cannot be called.
+        """
+        tables = iter(tables)
+        size = _FIRST_CHUNK
+        while rows := [
+            ((idx,), (idx,), table) for idx, table in islice(tables, size)
+        ]:
+            errors: List[Tuple[tuple, str, Any]] = []
+            deferred: List[Deferred] | None = None if defer is None else []
+            self._collect(rows, path, shape, provided, deferred, errors)
+            size *= 2
+
+            if deferred:
+                deferred.sort(key=lambda d: d[0])
+                for _, _path, adapter, value in deferred:
+                    defer(_path, adapter, value)
+
+            errors.sort(key=lambda e: e[0])
+            for _, key, result in errors:
+                yield key, result
+
+    def _collect(
+        self,
+        rows: List[Tuple[tuple, tuple, dict]],
+        path: List[str | int],
+        shape: Tuple[str, ...],
+        provided: Set[Tuple[str, ...]],
+        deferred: List[Deferred] | None,
+        errors: List[Tuple[tuple, str, Any]],
+    ) -> None:
+        """
+        Check tables of the same shape column by column.
+
+        Each row holds the position of a table in the document, its
+        path relative to the array and the table. Columns of tables are
+        checked the same way, while arrays in the tables are walked as
+        usual. The errors, and the values of batch handlers if deferred
+        is set, are added with their position, to be sorted into
+        document order.
+        """
+        keys: Dict[str, Any] = {}
+        for _, _, table in rows:
+            keys.update(table)
+
+        for key in keys:
+            column = [table.get(key, _absent) for _, _, table in rows]
+            _shape = shape + (key,)
+            adapter = self.resolve(_shape)
+            check = None if adapter is None else adapter.check
+            tables = []
+
+            # Values are checked in bulk if they cannot be tables
+            start = 0
+            if adapter is not None and _scalar_types(adapter):
+                start = first_mismatch(adapter, column)
+                if start:
+                    provided.add(_shape)
+
+            for i in range(start, len(column)):
+                if (value := column[i]) is _absent:
+                    continue
+                order, rel, table = rows[i]
+
+                # Table
+                if isinstance(value, dict):
+                    _order = order + (list(table).index(key),)
+                    tables.append((_order, rel + (key,), value))
+                    continue
+
+                # Array
+                if isinstance(value, list):
+                    _order = order + (list(table).index(key),)
+                    defer = None
+                    if deferred is not None:
+                        defer = partial(_defer_at, deferred, _order)
+                    for error in self.walk(
+                        {key: value}, [*path, *rel], shape, provided, defer
+                    ):
+                        errors.append((_order, *error))
+                    continue
+
+                # Value
+                provided.add(_shape)
+                if adapter is None:
+                    continue
+
+                if deferred is not None and adapter.batch is not None:
+                    _order = order + (list(table).index(key),)
+                    deferred.append(
+                        (_order, (*path, *rel, key), adapter, value)
+                    )
+                    continue
+
+                # Values are checked without their key, if possible
+                if check is not None:
+                    if not (render := check(value)):
+                        continue
+                    _key = format_key((*path, *rel, key))
+                    result = render(_key)
+                else:
+                    _path = (*path, *rel, key)
+                    if result := adapter.call(_path, value):
+                        _key = format_key(_path)
+
+                if result:
+                    _order = order + (list(table).index(key),)
+                    errors.append((_order, _key, result))
+
+            if tables:
+                self._collect(tables, path, _shape, provided, deferred, errors)
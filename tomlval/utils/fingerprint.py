@@ -0,0 +1,92 @@
+"""A function to create a stable fingerprint of schemas and handlers."""
+
+import hashlib
+import inspect
+import marshal
+import re
+from types import CodeType
+from typing import Any, Dict, List
+
+_address_pattern = re.compile(r" at 0x[0-9a-fA-F]+")
+
+
+def _global_names(code: CodeType) -> List[str]:
+    """Get the names a code object and its nested code objects refer to."""
+    names = list(code.co_names)
+    for const in code.co_consts:
+        if isinstance(const, CodeType):
+            names.extend(_global_names(const))
+    return sorted(set(names))
+
+
+def fingerprint(obj: Any) -> str:
+    """
+    Create a stable fingerprint of a schema, handlers or callbacks.
+
+    Types are identified by their import path, regex patterns by their
+    pattern and flags, and functions by their import path, bytecode,
+    defaults, captured variables and the globals they refer to, meaning
+    that editing a lambda or a helper function it calls changes the
+    fingerprint. Modules, and the methods of classes, are identified by
+    their name only. Other values are identified by their repr, without
+    memory addresses.
+
+    Args:
+        obj: Any - The object to fingerprint.
+    Returns:
+        str - The hexadecimal SHA-256 digest of the object.
+    Raises:
+        None
+    """
+    parts: List[bytes] = []
+    append = parts.append
+    seen = set()
+    names: Dict[type, bytes] = {}
+
+    def _feed(o: Any) -> None:
+        if isinstance(o, str):
+            append(f"str:{o!r};".encode())
+        elif isinstance(o, dict):
+            append(b"{")
+            for k, v in o.items():
+                _feed(k)
+                _feed(v)
+            append(b"}")
+        elif isinstance(o, (list, tuple)):
+            append(b"[" if isinstance(o, list) else b"(")
+            for v in o:
+                _feed(v)
+            append(b")")
+        elif isinstance(o, (set, frozenset)):
+            append(repr(sorted(map(repr, o))).encode())
+        elif isinstance(o, type):
+            if (name := names.get(o)) is None:
+                name = f"type:{o.__module__}.{o.__qualname__};".encode()
+                names[o] = name
+            append(name)
+        elif isinstance(o, re.Pattern):
+            append(f"re:{o.flags}:{o.pattern!r};".encode())
+        elif inspect.isfunction(o):
+            append(f"fn:{o.__module__}.{o.__qualname__};".encode())
+            if id(o) in seen:
+                return
+            seen.add(id(o))
+            append(marshal.dumps(o.__code__))
+            _feed(o.__defaults__)
+            for cell in o.__closure__ or ():
+                try:
+                    _feed(cell.cell_contents)
+                except ValueError:
+                    append(b"<empty>")
+            for name in _global_names(o.__code__):
+                if name in o.__globals__:
+                    _feed(name)
+                    _feed(o.__globals__[name])
+        elif inspect.ismodule(o):
+            append(f"module:{o.__name__};".encode())
+        else:
+            value = _address_pattern.sub("", repr(o))
+            append(f"{type(o).__name__}:{value};".encode())
+
+    _feed(obj)
+    return hashlib.sha256(b"".join(parts)).hexdigest()
@@ -0,0 +1,103 @@
+"""A path of segments for a key of a flattened document."""
+
+import re
+from functools import cached_property
+from typing import Dict, List, Sequence, Tuple
+
+from tomlval.utils.format_key import format_key
+
+_index_segment_pattern = re.compile(r"\[(\d+)]")
+
+_CACHE_SIZE = 65536
+_interned: Dict[str | Tuple[str | int, ...], "FlatPath"] = {}
+
+
+class FlatPath(tuple):
+    """
+    A path of segments for a key of a flattened document, where string
+    segments are keys and integer segments are array indexes.
+    (e.g. 'arr.[0].name' -> ('arr', 0, 'name'))
+
+    Parsed paths are interned, so parsing the same key again returns the
+    same path, and its shape and formatted key are only computed once.
+    A path is equal to the tuple of its segments.
+    """
+
+    @classmethod
+    def parse(cls, key: str | Sequence[str | int]) -> "FlatPath":
+        """
+        Get the interned path of a flattened key or of a sequence of
+        segments.
+
+        Args:
+            key: str | Sequence[str | int] - The flattened key, such as
+            'arr.[0].name', or its segments.
+        Returns:
+            FlatPath - The path.
+        Raises:
+            None
+        """
+        if isinstance(key, FlatPath):
+            return key
+        if not isinstance(key, str):
+            key = tuple(key)
+
+        try:
+            return _interned[key]
+        except KeyError:
+            pass
+
+        if isinstance(key, str):
+            path = cls(
+                (
+                    int(m.group(1))
+                    if (m := _index_segment_pattern.fullmatch(s))
+                    else s
+                )
+                for s in key.split(".")
+            )
+        else:
+            path = cls(key)
+
+        if len(_interned) >= _CACHE_SIZE:
+            _interned.clear()
+        _interned[key] = path
+
+        return path
+
+    def __repr__(self) -> str:
+        return f"FlatPath({self.key!r})"
+
+    def __str__(self) -> str:
+        return self.key
+
+    @cached_property
+    def key(self) -> str:
+        """The flattened key of the path (e.g. 'arr.[0].name')."""
+        return format_key(self)
+
+    @cached_property
+    def shape(self) -> Tuple[str, ...]:
+        """
+        The segments with array indexes folded into the key as '[]',
+        which is used for matching (e.g. ('arr[]', 'name')).
+        """
+        shape: List[str] = []
+        for segment in self:
+            if not isinstance(segment, int):
+                shape.append(segment)
+            elif shape:
+                shape[-1] = f"{shape[-1]}[]"
+            else:
+                shape.append("[]")
+        return tuple(shape)
+
+    @cached_property
+    def pattern(self) -> str:
+        """The array-normalized key of the path (e.g. 'arr[].name')."""
+        return ".".join(self.shape)
+
+    @cached_property
+    def bare(self) -> str:
+        """The key of the path without array indexes (e.g. 'arr.name')."""
+        return ".".join(s for s in self if isinstance(s, str))
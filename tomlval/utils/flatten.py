@@ -2,7 +2,7 @@
 
 import re
 from collections import defaultdict
-from typing import Any, Dict, Literal
+from typing import Any, Dict, Iterator, List, Literal, Tuple
 
 from tomlval import TOMLSchemaMergeError
 from tomlval.types import Handler
@@ -26,13 +26,18 @@ def flatten(
         TOMLSchemaMergeError - If a merged schema contains an
         invalid list value.
     """
+    if method == "all":
+        # Scalar list items are grouped while flattening
+        lists: Dict[str, list] = {}
+        result = _flatten_all(dictionary, lists)
+        result.update(lists)
+        return result
+
     pattern = re.compile(r"^(.*)\.\[(\d+)\]$")
     result = {}
     temp = defaultdict(list)
 
-    flat_dict = {"all": flatten_all, "schema": flatten_schema}[method](
-        dictionary
-    )
+    flat_dict = {"schema": flatten_schema}[method](dictionary)
 
     for key, value in flat_dict.items():
         match = pattern.match(key)
@@ -61,26 +66,59 @@ def flatten_all(dictionary: dict):
     Raises:
         None
     """
+    return _flatten_all(dictionary, None)
 
-    def _flatten(data: Dict[str, Any], parent_key: str = "") -> Dict[str, Any]:
-        """A recursive function to flatten a dictionary."""
-        _data: Dict[str, Any] = {}
-        for key, value in data.items():
-            full_key = f"{parent_key}.{key}" if parent_key else key
-            if isinstance(value, dict):
-                _data.update(_flatten(value, full_key))
-            elif isinstance(value, list):
-                for idx, item in enumerate(value):
-                    list_key = f"{full_key}.[{idx}]"
-                    if isinstance(item, (dict, list)):
-                        _data.update(_flatten(item, list_key))
-                    else:
-                        _data[list_key] = item
+
+def _frame(key: str, value: dict | list) -> Tuple[str, Iterator, bool]:
+    """Get the stack frame of a nested table or list."""
+    if isinstance(value, dict):
+        return key, iter(value.items()), False
+    return key, enumerate(value), True
+
+
+def _flatten_all(
+    dictionary: dict, lists: Dict[str, list] | None
+) -> Dict[str, Any]:
+    """
+    Flatten a dictionary without recursion, using a stack of iterators
+    so the keys are written in document order. If lists is given, the
+    scalar items of each list are appended to the list of its key,
+    instead of being written as separate keys.
+    """
+    result: Dict[str, Any] = {}
+    stack: List[Tuple[str, Iterator, bool]] = [_frame("", dictionary)]
+
+    while stack:
+        prefix, items, array = stack[-1]
+        if array:
+            group = None
+            for idx, value in items:
+                if not isinstance(value, (dict, list)):
+                    if lists is None:
+                        result[f"{prefix}.[{idx}]"] = value
+                        continue
+                    if group is None:
+                        group = lists.setdefault(prefix, [])
+                    group.append(value)
+                    continue
+                stack.append(_frame(f"{prefix}.[{idx}]", value))
+                break
             else:
-                _data[full_key] = value
-        return _data
+                stack.pop()
+            continue
+
+        for segment, value in items:
+            key = f"{prefix}.{segment}" if prefix else segment
+            if not isinstance(value, (dict, list)):
+                result[key] = value
+                continue
+            # Continue with the nested value, then resume this level
+            stack.append(_frame(key, value))
+            break
+        else:
+            stack.pop()
 
-    return _flatten(dictionary)
+    return result
 
 
 def flatten_schema(dictionary: dict):
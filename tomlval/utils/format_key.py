@@ -0,0 +1,28 @@
+"""A function to format a path of segments as a flattened key."""
+
+from typing import Sequence
+
+
+def format_key(path: str | Sequence[str | int]) -> str:
+    """
+    Format a path of segments as a flattened key.
+
+    String segments are joined with dots, while integer segments
+    are array indexes, formatted as '[i]'.
+    (e.g. ['arr', 0, 'name'] -> 'arr.[0].name')
+
+    Args:
+        path: str | Sequence[str | int] - The path, or an already
+        formatted key.
+    Returns:
+        str - The flattened key.
+    Raises:
+        None
+    """
+    if isinstance(path, str):
+        return path
+
+    return ".".join(
+        f"[{segment}]" if isinstance(segment, int) else segment
+        for segment in path
+    )
@@ -3,6 +3,8 @@
 import inspect
 from typing import Any
 
+from tomlval.utils.markers import is_batch
+
 
 def is_handler(fn: Any, key: str | None = None) -> str:
     """
@@ -29,6 +31,14 @@ def is_handler(fn: Any, key: str | None = None) -> str:
     # Parameters
     params = inspect.signature(fn).parameters
 
+    # Batch handlers
+    if is_batch(fn):
+        if len(params) == 1:
+            return ""
+        if key:
+            return f"Key '{key}' is a batch handler without 1 parameter."
+        return "Batch handler must have 1 parameter."
+
     invalid_keys = []
     for k in params:
         if k not in ["key", "value"]:
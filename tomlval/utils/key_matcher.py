@@ -0,0 +1,225 @@
+"""A segment trie used to resolve the most specific pattern for a key."""
+
+import re
+from typing import Dict, FrozenSet, Iterable, Sequence, Set, Tuple
+
+Rank = Tuple[int, int, int]
+
+
+class _Node:
+    """A node in the segment trie."""
+
+    __slots__ = ("literals", "globs", "terminal", "best")
+
+    def __init__(self):
+        self.literals: Dict[str, "_Node"] = {}
+        self.globs: Dict[str, Tuple[re.Pattern | None, "_Node"]] = {}
+        self.terminal: Tuple[Rank, str] | None = None
+        self.best: Rank | None = None
+
+
+class KeyMatcher:
+    """
+    A matcher that resolves the most specific wildcard pattern for a key.
+
+    Patterns are split into dotted segments and stored in a trie. Literal
+    segments are resolved with a dictionary lookup, while segments with a
+    wildcard are matched by a regex compiled once per segment.
+
+    By default a wildcard may span several dotted segments, like the
+    patterns '*' or 'user.*' matching 'user.address.street'. In segment
+    mode, a wildcard only matches within a single segment.
+
+    When several patterns match, the one with the most non-wildcard
+    characters wins, followed by the one with the fewest wildcards,
+    followed by the one added first.
+    """
+
+    def __init__(
+        self,
+        patterns: Iterable[str],
+        segment_wildcards: bool = False,
+        cache_size: int = 65536,
+    ):
+        """
+        Build a new key matcher.
+
+        Args:
+            patterns: Iterable[str] - The patterns to match against.
+            segment_wildcards?: bool - Whether a wildcard only
+            matches a single segment.
+            cache_size?: int - The maximum number of resolved keys to cache.
+        Returns:
+            None
+        Raises:
+            None
+        """
+        self._segment_wildcards = segment_wildcards
+        self._cache_size = cache_size
+        self._cache: Dict[str, str | None] = {}
+        self._all_cache: Dict[str, FrozenSet[str]] = {}
+        self._exact: Dict[str, str] = {}
+        self._root = _Node()
+
+        for idx, pattern in enumerate(patterns):
+            self._exact.setdefault(pattern, pattern)
+            if "*" in pattern:
+                rank = (
+                    -len(pattern.replace("*", "")),
+                    pattern.count("*"),
+                    idx,
+                )
+                self._insert(pattern, rank)
+
+    def __len__(self) -> int:
+        return len(self._exact)
+
+    def _insert(self, pattern: str, rank: Rank) -> None:
+        """Insert a wildcard pattern into the trie."""
+        node = self._root
+        path = [node]
+
+        for segment in pattern.split("."):
+            if "*" not in segment:
+                node = node.literals.setdefault(segment, _Node())
+            else:
+                if segment not in node.globs:
+                    regex = None
+                    if segment != "*":
+                        regex = re.compile(
+                            re.escape(segment).replace("\\*", ".*")
+                        )
+                    node.globs[segment] = (regex, _Node())
+                node = node.globs[segment][1]
+            path.append(node)
+
+        if node.terminal is None or rank < node.terminal[0]:
+            node.terminal = (rank, pattern)
+
+        for _node in path:
+            if _node.best is None or rank < _node.best:
+                _node.best = rank
+
+    def _search(
+        self,
+        node: _Node,
+        segments: Sequence[str],
+        index: int,
+        best: Tuple[Rank, str] | None,
+    ) -> Tuple[Rank, str] | None:
+        """Find the best terminal below a node for the remaining segments."""
+        if node.best is None or (best is not None and node.best >= best[0]):
+            return best
+
+        if index == len(segments):
+            if node.terminal is not None and (
+                best is None or node.terminal[0] < best[0]
+            ):
+                return node.terminal
+            return best
+
+        child = node.literals.get(segments[index])
+        if child is not None:
+            best = self._search(child, segments, index + 1, best)
+
+        for regex, child in node.globs.values():
+            if self._segment_wildcards:
+                if regex is None or regex.fullmatch(segments[index]):
+                    best = self._search(child, segments, index + 1, best)
+                continue
+
+            for end in range(index + 1, len(segments) + 1):
+                if regex is None or regex.fullmatch(
+                    ".".join(segments[index:end])
+                ):
+                    best = self._search(child, segments, end, best)
+
+        return best
+
+    def match(self, key: str) -> str | None:
+        """
+        Get the most specific pattern matching a key.
+
+        Args:
+            key: str - The key to match.
+        Returns:
+            str | None - The matching pattern, if any.
+        Raises:
+            None
+        """
+        if key in self._exact:
+            return self._exact[key]
+
+        try:
+            return self._cache[key]
+        except KeyError:
+            pass
+
+        result = self._search(self._root, key.split("."), 0, None)
+        pattern = None if result is None else result[1]
+
+        if len(self._cache) >= self._cache_size:
+            self._cache.clear()
+        self._cache[key] = pattern
+
+        return pattern
+
+    def _search_all(
+        self,
+        node: _Node,
+        segments: Sequence[str],
+        index: int,
+        found: Set[str],
+    ) -> None:
+        """Collect every terminal below a node for the remaining segments."""
+        if node.best is None:
+            return
+
+        if index == len(segments):
+            if node.terminal is not None:
+                found.add(node.terminal[1])
+            return
+
+        child = node.literals.get(segments[index])
+        if child is not None:
+            self._search_all(child, segments, index + 1, found)
+
+        for regex, child in node.globs.values():
+            if self._segment_wildcards:
+                if regex is None or regex.fullmatch(segments[index]):
+                    self._search_all(child, segments, index + 1, found)
+                continue
+
+            for end in range(index + 1, len(segments) + 1):
+                if regex is None or regex.fullmatch(
+                    ".".join(segments[index:end])
+                ):
+                    self._search_all(child, segments, end, found)
+
+    def match_all(self, key: str) -> FrozenSet[str]:
+        """
+        Get every pattern matching a key.
+
+        Args:
+            key: str - The key to match.
+        Returns:
+            FrozenSet[str] - The matching patterns.
+        Raises:
+            None
+        """
+        try:
+            return self._all_cache[key]
+        except KeyError:
+            pass
+
+        found: Set[str] = set()
+        self._search_all(self._root, key.split("."), 0, found)
+        if key in self._exact:
+            found.add(key)
+        patterns = frozenset(found)
+
+        if len(self._all_cache) >= self._cache_size:
+            self._all_cache.clear()
+        self._all_cache[key] = patterns
+
+        return patterns
@@ -0,0 +1,105 @@
+"""A bounded least-recently-used cache with hit and miss counters."""
+
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+
+class LRUCache:
+    """
+    A thread-safe cache that evicts the least recently used entry
+    once it is full.
+    """
+
+    def __init__(self, maxsize: int = 4096):
+        """
+        Initialize a new cache.
+
+        Args:
+            maxsize?: int - The maximum number of entries.
+        Returns:
+            None
+        Raises:
+            ValueError - If maxsize is less than 1.
+        """
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1.")
+
+        self._maxsize = maxsize
+        self._entries: OrderedDict[Hashable, Any] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __repr__(self) -> str:
+        return (
+            f"<LRUCache size={len(self)}/{self._maxsize}"
+            f" hits={self.hits} misses={self.misses}>"
+        )
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    @property
+    def maxsize(self) -> int:
+        """The maximum number of entries."""
+        return self._maxsize
+
+    def get_or_call(
+        self, key: Hashable, fn: Callable[..., Any], *args: Any
+    ) -> Any:
+        """
+        Get the cached value of a key, or call a function to create it.
+
+        Args:
+            key: Hashable - The key of the value.
+            fn: Callable[..., Any] - The function creating the value.
+            *args: Any - The arguments of the function.
+        Returns:
+            Any - The cached or created value.
+        Raises:
+            TypeError - If the key is not hashable.
+        """
+        with self._lock:
+            try:
+                value = self._entries[key]
+            except KeyError:
+                self.misses += 1
+            else:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+
+        value = fn(*args)
+
+        with self._lock:
+            self._entries[key] = value
+            if len(self._entries) > self._maxsize:
+                self._entries.popitem(last=False)
+
+        return value
+
+    def clear(self) -> None:
+        """
+        Remove every entry and reset the counters.
+
+        Args:
+            None
+        Returns:
+            None
+        Raises:
+            None
+        """
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
@@ -0,0 +1,119 @@
+"""Decorators to mark how a handler should be run."""
+
+import inspect
+from typing import Callable, TypeVar
+
+F = TypeVar("F", bound=Callable)
+
+_EXPENSIVE = "_tomlval_expensive"
+_PURE = "_tomlval_pure"
+_BATCH = "_tomlval_batch"
+
+
+def _mark(fn: F, attribute: str) -> F:
+    """Set a marker attribute on a handler function."""
+    if not inspect.isfunction(fn):
+        raise TypeError("Handler must be a function.")
+
+    setattr(fn, attribute, True)
+    return fn
+
+
+def expensive(fn: F) -> F:
+    """
+    Mark a handler as expensive.
+
+    Expensive handlers are run in the 'parallel_handlers' executor of
+    the validator, if it has one, while other handlers run inline.
+
+    Args:
+        fn: F - The handler function.
+    Returns:
+        F - The same handler function.
+    Raises:
+        TypeError - If the handler is not a function.
+    """
+    return _mark(fn, _EXPENSIVE)
+
+
+def is_expensive(fn: Callable) -> bool:
+    """
+    Check if a handler is marked as expensive.
+
+    Args:
+        fn: Callable - The handler function.
+    Returns:
+        bool - True if the handler is expensive, False otherwise.
+    Raises:
+        None
+    """
+    return getattr(fn, _EXPENSIVE, False) is True
+
+
+def pure(fn: F) -> F:
+    """
+    Mark a handler as pure.
+
+    The result of a pure handler only depends on its parameters, so it
+    is cached by the validator and reused for values it has seen.
+
+    Args:
+        fn: F - The handler function.
+    Returns:
+        F - The same handler function.
+    Raises:
+        TypeError - If the handler is not a function.
+    """
+    return _mark(fn, _PURE)
+
+
+def is_pure(fn: Callable) -> bool:
+    """
+    Check if a handler is marked as pure.
+
+    Args:
+        fn: Callable - The handler function.
+    Returns:
+        bool - True if the handler is pure, False otherwise.
+    Raises:
+        None
+    """
+    return getattr(fn, _PURE, False) is True
+
+
+def batch(fn: F) -> F:
+    """
+    Mark a handler as a batch handler.
+
+    A batch handler has a single parameter, which receives every value
+    matched by its pattern in a document as a list, and returns the
+    errors by index. Functions with a single 'values' parameter are
+    batch handlers without being marked.
+
+    Args:
+        fn: F - The handler function.
+    Returns:
+        F - The same handler function.
+    Raises:
+        TypeError - If the handler is not a function.
+    """
+    return _mark(fn, _BATCH)
+
+
+def is_batch(fn: Callable) -> bool:
+    """
+    Check if a handler is a batch handler, either by being marked or
+    by having a single 'values' parameter.
+
+    Args:
+        fn: Callable - The handler function.
+    Returns:
+        bool - True if the handler is a batch handler, False otherwise.
+    Raises:
+        None
+    """
+    if getattr(fn, _BATCH, False) is True:
+        return True
+    if not inspect.isfunction(fn):
+        return False
+    return tuple(inspect.signature(fn).parameters) == ("values",)
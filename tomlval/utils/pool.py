@@ -0,0 +1,144 @@
+"""A function to map a function over items with a thread or process pool."""
+
+import itertools
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Executor,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+from typing import Any, Callable, Iterable, Iterator, List, Literal, Tuple
+
+ExecutorType = Literal["thread", "process"]
+
+
+def _run_chunk(fn: Callable[[Any], Any], chunk: List[Any]) -> List[Any]:
+    """Run a function over a chunk of items in a worker."""
+    return [fn(item) for item in chunk]
+
+
+def _create_executor(
+    executor: ExecutorType,
+    workers: int,
+    initializer: Callable[..., None] | None,
+    initargs: tuple,
+) -> Executor:
+    """Create a thread or process pool."""
+    if executor == "thread":
+        return ThreadPoolExecutor(
+            max_workers=workers, initializer=initializer, initargs=initargs
+        )
+
+    # Forked workers inherit the initializer arguments instead of
+    # receiving them pickled, which allows unpicklable handlers.
+    if "fork" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("fork")
+    else:
+        context = multiprocessing.get_context()
+
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=context,
+        initializer=initializer,
+        initargs=initargs,
+    )
+
+
+def pool_map(
+    fn: Callable[[Any], Any],
+    items: Iterable[Any],
+    workers: int | None = None,
+    executor: ExecutorType = "thread",
+    ordered: bool = True,
+    chunksize: int = 1,
+    initializer: Callable[..., None] | None = None,
+    initargs: tuple = (),
+) -> Iterator[Tuple[int, Any]]:
+    """
+    Map a function over items using a thread or process pool.
+
+    Items are consumed lazily and sent to the workers in chunks, with a
+    bounded number of chunks in flight, so arbitrarily long iterables can
+    be processed with constant memory.
+
+    In process mode, the workers are forked when the platform supports
+    it, so the initializer arguments are inherited rather than pickled.
+    The function itself must be importable by the workers.
+
+    Args:
+        fn: Callable[[Any], Any] - The function to run for each item.
+        items: Iterable[Any] - The items to process.
+        workers?: int | None - The number of workers, defaults to the
+        number of CPUs.
+        executor?: Literal["thread", "process"] - The type of pool.
+        ordered?: bool - Whether to yield results in input order, or as
+        soon as they finish.
+        chunksize?: int - The number of items sent to a worker at once.
+        initializer?: Callable[..., None] | None - A function that runs
+        once in each worker.
+        initargs?: tuple - The arguments of the initializer.
+    Returns:
+        Iterator[Tuple[int, Any]] - The index of each item and its result.
+    Raises:
+        ValueError - If the executor, workers or chunksize are invalid.
+    """
+    if executor not in ("thread", "process"):
+        raise ValueError("Executor must be either 'thread' or 'process'.")
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    if workers < 1:
+        raise ValueError("Workers must be at least 1.")
+
+    if chunksize < 1:
+        raise ValueError("Chunksize must be at least 1.")
+
+    def _chunks() -> Iterator[Tuple[int, List[Any]]]:
+        iterator = iter(items)
+        start = 0
+        while chunk := list(itertools.islice(iterator, chunksize)):
+            yield start, chunk
+            start += len(chunk)
+
+    def _map() -> Iterator[Tuple[int, Any]]:
+        pool = _create_executor(executor, workers, initializer, initargs)
+        window = workers * 2
+        chunks = _chunks()
+
+        try:
+            if ordered:
+                pending: deque[Tuple[int, Future]] = deque()
+                for start, chunk in chunks:
+                    pending.append((start, pool.submit(_run_chunk, fn, chunk)))
+                    if len(pending) >= window:
+                        start, future = pending.popleft()
+                        yield from enumerate(future.result(), start)
+                while pending:
+                    start, future = pending.popleft()
+                    yield from enumerate(future.result(), start)
+                return
+
+            running: dict[Future, int] = {}
+
+            def _finished() -> Iterator[Tuple[int, Any]]:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    start = running.pop(future)
+                    yield from enumerate(future.result(), start)
+
+            for start, chunk in chunks:
+                running[pool.submit(_run_chunk, fn, chunk)] = start
+                if len(running) >= window:
+                    yield from _finished()
+            while running:
+                yield from _finished()
+        finally:
+            pool.shutdown(cancel_futures=True)
+
+    return _map()
@@ -0,0 +1,198 @@
+"""A walker that reuses the failures of identical tables."""
+
+from typing import Any, Callable, Iterator, List, Set, Tuple
+
+from tomlval.utils.adapt_handler import HandlerAdapter, Render
+from tomlval.utils.format_key import format_key
+from tomlval.utils.lru_cache import LRUCache
+
+_UNCACHEABLE_SIZE = 65536
+
+Defer = Callable[[List[str | int], HandlerAdapter, Any], None]
+
+
+class _Uncacheable(Exception):
+    """Raised when a table has a handler that depends on the key."""
+
+    def __init__(self, shape: Tuple[str, ...]):
+        super().__init__(shape)
+        self.shape = shape
+
+
+class _Frozen:
+    """
+    A hashable, type-sensitive representation of a value, with its
+    hash computed once from the hashes of its children.
+    """
+
+    __slots__ = ("type", "items", "hash")
+
+    def __init__(self, _type: type, items: Any):
+        self.type = _type
+        self.items = items
+        self.hash = hash((_type, items))
+
+    def __hash__(self) -> int:
+        return self.hash
+
+    def __eq__(self, other: object) -> bool:
+        return (
+            isinstance(other, _Frozen)
+            and self.hash == other.hash
+            and self.type is other.type
+            and self.items == other.items
+        )
+
+
+def _freeze(node: Any) -> _Frozen:
+    """Freeze a value, raising a TypeError if it is not hashable."""
+    if isinstance(node, dict):
+        return _Frozen(dict, tuple((k, _freeze(v)) for k, v in node.items()))
+    if isinstance(node, list):
+        return _Frozen(list, tuple(_freeze(v) for v in node))
+    return _Frozen(type(node), node)
+
+
+class SubtreeWalker:
+    """
+    A walker that caches the failures of each table by its shape and
+    content, so an identical table at the same shape reuses them, with
+    the errors rendered for its own path.
+
+    Tables with handlers that depend on the key are walked as usual,
+    and their shapes are remembered so they are not tried again.
+    """
+
+    __slots__ = ("memo", "resolve", "walk", "uncacheable")
+
+    def __init__(
+        self,
+        memo: LRUCache,
+        resolve: Callable[[Tuple[str, ...]], HandlerAdapter | None],
+        walk: Callable[..., Iterator[Tuple[str, Any]]],
+    ):
+        """
+        Initialize a new subtree walker.
+
+        Args:
+            memo: LRUCache - The cache of the failures of each table.
+            resolve: Callable[[Tuple[str, ...]], HandlerAdapter | None] -
+            The function that finds the adapter for an array-normalized
+            path.
+            walk: Callable[..., Iterator[Tuple[str, Any]]] - The generic
+            walker, called with a table, the path, the shape of the
+            table, the provided keys and defer, for uncacheable tables.
+        Returns:
+            None
+        Raises:
+            None
+        """
+        self.memo = memo
+        self.resolve = resolve
+        self.walk = walk
+        self.uncacheable: Set[Tuple[str, ...]] = set()
+
+    def __call__(
+        self,
+        node: dict,
+        path: List[str | int],
+        shape: Tuple[str, ...],
+        provided: Set[Tuple[str, ...]],
+        defer: Defer | None = None,
+    ) -> Iterator[Tuple[str, Any]]:
+        """
+        Walk a table, reusing the failures of an identical table with
+        the same shape, and rendering them for the current path.
+
+        Args:
+            node: dict - The table.
+            path: List[str | int] - The path of the table.
+            shape: Tuple[str, ...] - The array-normalized shape of the
+            table.
+            provided: Set[Tuple[str, ...]] - The provided shapes, which
+            are added to.
+            defer?: Defer | None - The function deferred handlers are
+            passed to, for tables that are walked as usual.
+        Returns:
+            Iterator[Tuple[str, Any]] - The key and error of each error.
+        Raises:
+            TOMLHandlerError - If a handler cannot be called.
+        """
+        subtree = None
+        if shape not in self.uncacheable:
+            try:
+                subtree = self._collect(node, shape, _freeze(node))
+            except _Uncacheable as e:
+                if len(self.uncacheable) >= _UNCACHEABLE_SIZE:
+                    self.uncacheable.clear()
+                for i in range(len(shape), len(e.shape)):
+                    self.uncacheable.add(e.shape[:i])
+            except TypeError:
+                pass
+
+        if subtree is None:
+            yield from self.walk(node, path, shape, provided, defer)
+            return
+
+        failures, shapes = subtree
+        provided.update(shapes)
+        for rel, render in failures:
+            key = format_key((*path, *rel))
+            if result := render(key):
+                yield key, result
+
+    def _collect(
+        self, node: dict, shape: Tuple[str, ...], frozen: _Frozen
+    ) -> Tuple[tuple, frozenset]:
+        """
+        Get the failures of a table from the memo cache, or walk it in
+        the same order as the generic walker, collecting the relative
+        path and error renderer of each failure, along with the provided
+        shapes. Nested tables are looked up in the memo cache as well.
+        """
+        return self.memo.get_or_call(
+            (self, shape, frozen), self._collect_table, node, shape, frozen
+        )
+
+    def _collect_table(
+        self, node: dict, shape: Tuple[str, ...], frozen: _Frozen
+    ) -> Tuple[tuple, frozenset]:
+        """Walk a table that is not in the memo cache."""
+        failures: List[Tuple[tuple, Render]] = []
+        provided: Set[Tuple[str, ...]] = set()
+
+        def _merge(rel: tuple, subtree: Tuple[tuple, frozenset]) -> None:
+            failures.extend((rel + r, render) for r, render in subtree[0])
+            provided.update(subtree[1])
+
+        for (key, value), (_, _frozen) in zip(node.items(), frozen.items):
+            # Table
+            if isinstance(value, dict):
+                _merge((key,), self._collect(value, shape + (key,), _frozen))
+                continue
+
+            # Array
+            if isinstance(value, list):
+                scalars = []
+                _shape = shape + (f"{key}[]",)
+                for idx, (item, _item) in enumerate(zip(value, _frozen.items)):
+                    if isinstance(item, dict):
+                        _merge((key, idx), self._collect(item, _shape, _item))
+                    else:
+                        scalars.append(item)
+                if not scalars:
+                    continue
+                value = scalars
+
+            # Value
+            _shape = shape + (key,)
+            provided.add(_shape)
+
+            if (adapter := self.resolve(_shape)) is None:
+                continue
+            if adapter.check is None:
+                raise _Uncacheable(_shape)
+            if render := adapter.check(value):
+                failures.append(((key,), render))
+
+        return tuple(failures), frozenset(provided)
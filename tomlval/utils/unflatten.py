@@ -2,6 +2,8 @@
 
 # pylint: disable=R0912
 
+from tomlval.utils.flat_path import FlatPath
+
 
 def unflatten(dictionary: dict) -> dict:
     """
@@ -15,39 +17,33 @@ def unflatten(dictionary: dict) -> dict:
         ValueError - If the dictionary is not a single level dictionary.
     """
 
-    def is_list_index(segment: str) -> bool:
-        return (
-            segment.startswith("[")
-            and segment.endswith("]")
-            and segment[1:-1].isdigit()
-        )
-
     result = {}
     for flat_key, value in dictionary.items():
-        segments = flat_key.split(".")
+        segments = FlatPath.parse(flat_key)
         current = result
         for i, segment in enumerate(segments):
             is_last = i == len(segments) - 1
-            if is_list_index(segment):
-                index = int(segment[1:-1])
+            if isinstance(segment, int):
                 if not isinstance(current, list):
                     raise ValueError(
                         " ".join(
                             [
                                 "Expected list at segment",
-                                f"'{segment}' in key '{flat_key}'",
+                                f"'[{segment}]' in key '{flat_key}'",
                             ]
                         )
                     )
-                while len(current) <= index:
+                while len(current) <= segment:
                     current.append(None)
                 if is_last:
-                    current[index] = value
+                    current[segment] = value
                 else:
-                    if current[index] is None:
+                    if current[segment] is None:
                         next_seg = segments[i + 1]
-                        current[index] = [] if is_list_index(next_seg) else {}
-                    current = current[index]
+                        current[segment] = (
+                            [] if isinstance(next_seg, int) else {}
+                        )
+                    current = current[segment]
             else:
                 if not isinstance(current, dict):
                     raise ValueError(
@@ -63,6 +59,8 @@ def unflatten(dictionary: dict) -> dict:
                 else:
                     if segment not in current:
                         next_seg = segments[i + 1]
-                        current[segment] = [] if is_list_index(next_seg) else {}
+                        current[segment] = (
+                            [] if isinstance(next_seg, int) else {}
+                        )
                     current = current[segment]
     return result